@@ -44,7 +44,7 @@ class MainView(view.View):
     def _prepare_body(self, parent=None):
         if parent is None:
             parent = self
-        log = LogView(parent)
+        log = LogView(parent, max_lines=10000)
         self.add_widget("log", log)
         log.pack(fill=view.tk.BOTH, expand=1)
 
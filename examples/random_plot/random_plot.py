@@ -1,6 +1,6 @@
 """The Random Plot Application plots random y-values using random generator"""
 from julesTk import app, view
-from julesTk.utils.observe import Observer
+from julesTk.utils.observe import Observer, Change
 from julesTk.controller.poller import Poller
 from julesTk.model.random import RandomModel
 from julesTk.view.plot import PlotFrame
@@ -51,20 +51,40 @@ class MainController(Poller, Observer):
         self.model.update()
 
     def _stop(self):
+        self.set_polling(False)
+        if self.has_model():
+            self.model.unregister_observer(self)
         self.view.close()
 
     def update(self, observable):
         if isinstance(observable, RandomModel):
             self.update_plot()
 
+    def process_changes(self, observable, changes):
+        if not isinstance(observable, RandomModel):
+            return
+        for change in changes:
+            if change.kind == Change.APPEND:
+                self.append_plot(change.start, change.count)
+            elif change.kind != Change.ATTRIBUTE:
+                self.update_plot()
+
     def update_plot(self):
         plt = self.view.plot
-        # initialize
-        plt.clear()
-        data = self.model.data[:]
-        if len(data) > 0:
-            # now plot
-            plt.axes.plot(range(len(data)), data)
+        if not plt.has_line("random"):
+            plt.add_line("random")
+        offset, data = self.model.offset, self.model.data[:]
+        plt.set_data("random", range(offset, offset + len(data)), data)
+        plt.draw()
+
+    def append_plot(self, start, count):
+        """Only add the new samples to the plotted line"""
+        plt = self.view.plot
+        if not plt.has_line("random"):
+            return self.update_plot()
+        data = self.model.window(start, start + count)
+        stop = start + count
+        plt.append("random", range(stop - len(data), stop), data)
         plt.draw()
 
     def start_poller(self):
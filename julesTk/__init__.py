@@ -1,6 +1,6 @@
 """Some basic classes"""
 
-from threading import RLock
+from threading import RLock, Lock, Condition, current_thread, local
 
 import sys
 import functools
@@ -26,18 +26,140 @@ class JulesException(BaseException):
         return self._msg
 
 
+class ReadWriteLock(object):
+    """A lock allowing either multiple threads to read or a single thread to write
+
+    Both sides are re-entrant and the thread holding the write lock may also acquire the read lock. Waiting writers
+    have preference over new readers, so a steady stream of readers can not starve a writer.
+    A read lock can not be upgraded to a write lock: acquiring the write lock while holding the read lock fails.
+
+    Use `read` and `write` as locks: `with rwlock.read: ...`
+    """
+
+    def __init__(self):
+        super(ReadWriteLock, self).__init__()
+        self._condition = Condition(Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = local()
+        self._read = _LockSide(self.acquire_read, self.release_read)
+        self._write = _LockSide(self.acquire_write, self.release_write)
+
+    @property
+    def read(self):
+        """The shared side of the lock"""
+        return self._read
+
+    @property
+    def write(self):
+        """The exclusive side of the lock"""
+        return self._write
+
+    def _get_read_depth(self):
+        return getattr(self._local, "depth", 0)
+
+    def _set_read_depth(self, depth):
+        self._local.depth = depth
+
+    def acquire_read(self):
+        with self._condition:
+            thread = current_thread()
+            if self._writer is not thread and self._get_read_depth() == 0:
+                while self._writer is not None or self._waiting_writers > 0:
+                    self._condition.wait()
+            self._readers += 1
+            self._set_read_depth(self._get_read_depth() + 1)
+        return True
+
+    def release_read(self):
+        with self._condition:
+            depth = self._get_read_depth()
+            if depth == 0:
+                raise RuntimeError("Cannot release an un-acquired read lock")
+            self._set_read_depth(depth - 1)
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            thread = current_thread()
+            if self._writer is not thread:
+                if self._get_read_depth() > 0:
+                    raise RuntimeError("Cannot upgrade a read lock to a write lock")
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers > 0:
+                        self._condition.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = thread
+            self._writer_depth += 1
+        return True
+
+    def release_write(self):
+        with self._condition:
+            if self._writer is not current_thread():
+                raise RuntimeError("Cannot release an un-acquired write lock")
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+
+class _LockSide(object):
+    """Presents one side of a ReadWriteLock as a normal lock"""
+
+    def __init__(self, acquire, release):
+        super(_LockSide, self).__init__()
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
 class ThreadSafeObject(object):
-    """A class providing infrastructure for creating thread-safe objects"""
+    """A class providing infrastructure for creating thread-safe objects
+
+    By default all access is serialized using one re-entrant lock. Set `READ_WRITE_LOCK` to True in a subclass to
+    use a `ReadWriteLock` instead: methods decorated with `read_safe` (or code using `read_lock`) can then run
+    concurrently, while `write_safe`, `thread_safe` and `lock` give exclusive access.
+    """
+
+    READ_WRITE_LOCK = False
 
     def __init__(self):
         super(ThreadSafeObject, self).__init__()
-        self._lock = RLock()
+        if self.READ_WRITE_LOCK:
+            rw_lock = ReadWriteLock()
+            self._lock = rw_lock.write
+            self._read_lock = rw_lock.read
+        else:
+            self._lock = RLock()
+            self._read_lock = self._lock
 
     @property
     def lock(self):
         """Retrieve the lock of this object"""
         return self._lock
 
+    @property
+    def read_lock(self):
+        """Lock for reading, shared between readers when using a read-write lock"""
+        return self._read_lock
+
+    @property
+    def write_lock(self):
+        """Lock for writing, always exclusive (same as `lock`)"""
+        return self._lock
+
     def thread_safe(f):
         """A decorator for making methods thread-safe"""
         @functools.wraps(f)
@@ -51,3 +173,25 @@ class ThreadSafeObject(object):
         return magic
 
     thread_safe = staticmethod(thread_safe)
+
+    def read_safe(f):
+        """A decorator for methods only reading from the object"""
+        @functools.wraps(f)
+        def magic(self, *args, **kwargs):
+            with self.read_lock:
+                result = f(self, *args, **kwargs)
+            return result
+        return magic
+
+    read_safe = staticmethod(read_safe)
+
+    def write_safe(f):
+        """A decorator for methods changing the object"""
+        @functools.wraps(f)
+        def magic(self, *args, **kwargs):
+            with self.write_lock:
+                result = f(self, *args, **kwargs)
+            return result
+        return magic
+
+    write_safe = staticmethod(write_safe)
@@ -3,6 +3,8 @@
 """
 
 from julesTk import ThreadSafeObject
+from julesTk.utils.observe import Dispatcher, get_dispatcher, set_dispatcher
+from julesTk.utils.scheduler import Scheduler
 import sys
 if sys.version_info[0] < 3:
     import Tkinter as tk
@@ -24,11 +26,29 @@ class Application(ThreadSafeObject):
         self.root.protocol("WM_DELETE_WINDOW", self.stop)
         self._controllers = {}
         self._hooks = {}
+        self._dispatcher = Dispatcher(self.root)
+        self._scheduler = Scheduler(self.root)
 
     @property
     def root(self):
         return self._root
 
+    @property
+    def dispatcher(self):
+        """Delivers notifications of observables changed in other threads in the main thread
+
+        :rtype: julesTk.utils.observe.Dispatcher
+        """
+        return self._dispatcher
+
+    @property
+    def scheduler(self):
+        """Runs timed callbacks (e.g. of pollers) from a single timer
+
+        :rtype: julesTk.utils.scheduler.Scheduler
+        """
+        return self._scheduler
+
     @property
     def controllers(self):
         """All controllers attached to this application
@@ -181,6 +201,8 @@ class Application(ThreadSafeObject):
         # run all hooks associated with starting
         if self.process_hook("APP_START"):
             # if successful: start
+            set_dispatcher(self.dispatcher)
+            self.dispatcher.start()
             self._start()
         else:
             # else exit immediately
@@ -210,4 +232,8 @@ class Application(ThreadSafeObject):
             self.remove_controller(name)
             if controller.is_running():
                 controller.stop()
+        self.scheduler.stop()
+        self.dispatcher.stop()
+        if get_dispatcher() is self.dispatcher:
+            set_dispatcher(None)
         tk.Tk.quit(self.root)
@@ -1,17 +1,59 @@
 """The polling mixin for controllers (poller) helps controllers to update the view based on changes in the model"""
 
 from julesTk.controller import Controller
+from julesTk.utils.scheduler import monotonic
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import logging
 
 __author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
 
 
 class Poller(Controller):
-    """A controller that does something at a given interval"""
+    """A controller that does something at a given interval
+
+    Ticks are scheduled on fixed deadlines (`interval` seconds apart, measured with a monotonic clock), so the time
+    spent in `execute` does not delay the following ticks. When `execute` takes longer than the interval, one or
+    more deadlines are missed; the `overrun` policy decides what happens:
+
+    - skip: Drop the missed ticks and wait for the next deadline
+    - catch_up: Run all missed ticks as soon as possible
+    - coalesce: Run one tick immediately for all missed ticks, following ticks are scheduled from now
+
+    The lateness of each tick (time between the deadline and the start of the tick) is measured,
+    see `lateness`, `max_lateness` and `mean_lateness`.
+
+    Ticks are scheduled by the `Scheduler` of the application, which runs all pollers from one Tk timer. Pollers due
+    at (nearly) the same time are run in the same frame, in order of `priority`.
+
+    Adaptive interval
+    -----------------
+
+    After `set_adaptive(minimum, maximum)` the interval adapts to the activity: `execute` reports that nothing
+    changed by returning False. The interval is multiplied by `backoff` (up to maximum) when nothing changed or
+    when `execute` used more than `budget` (a fraction) of the interval. As soon as something changes, the interval
+    returns to the minimum.
+    """
+
+    OVERRUN_SKIP = "skip"
+    OVERRUN_CATCH_UP = "catch_up"
+    OVERRUN_COALESCE = "coalesce"
+
+    OVERRUN_POLICIES = (OVERRUN_SKIP, OVERRUN_CATCH_UP, OVERRUN_COALESCE)
 
     def __init__(self, *args, **kwargs):
         super(Poller, self).__init__(*args, **kwargs)
         self._interval = 1  # in seconds
         self._polling = False  # whether the poller is active
+        self._overrun = self.OVERRUN_SKIP
+        self._deadline = None
+        self._priority = 0
+        self._job = None
+        self._adaptive = False
+        self._min_interval = None
+        self._max_interval = None
+        self._backoff = 2.0
+        self._budget = 0.5
+        self.reset_statistics()
 
     @property
     def interval(self):
@@ -21,6 +63,123 @@ class Poller(Controller):
     def interval(self, v):
         self._interval = v
 
+    @property
+    def overrun(self):
+        """Policy for handling missed deadlines"""
+        return self._overrun
+
+    @overrun.setter
+    def overrun(self, policy):
+        if policy not in self.OVERRUN_POLICIES:
+            raise ValueError("Invalid overrun policy: {}".format(policy))
+        self._overrun = policy
+
+    def is_adaptive(self):
+        """Whether the interval adapts to the activity"""
+        return self._adaptive
+
+    def set_adaptive(self, minimum, maximum, backoff=2.0, budget=0.5):
+        """Let the interval adapt to activity, between minimum and maximum (in seconds)
+
+        :param minimum: Interval used while things are changing
+        :type minimum: int | float
+        :param maximum: Largest interval used when idle
+        :type maximum: int | float
+        :param backoff: Factor to widen the interval with when idle or busy
+        :type backoff: float
+        :param budget: Fraction of the interval that execute may use before the interval is widened
+        :type budget: float
+        """
+        if not 0 < minimum <= maximum:
+            raise ValueError("Invalid interval bounds: {} - {}".format(minimum, maximum))
+        if backoff <= 1:
+            raise ValueError("Invalid backoff factor: {}".format(backoff))
+        self._adaptive = True
+        self._min_interval = minimum
+        self._max_interval = maximum
+        self._backoff = backoff
+        self._budget = budget
+        self.interval = min(max(self.interval, minimum), maximum)
+
+    def disable_adaptive(self, interval=None):
+        """Stop adapting the interval, optionally setting a fixed interval"""
+        self._adaptive = False
+        if interval is not None:
+            self.interval = interval
+
+    def adapt(self, changed, duration):
+        """Adapt the interval to the outcome of an execution
+
+        :param changed: Whether execute reported a change
+        :type changed: bool
+        :param duration: Time spent executing (in seconds)
+        :type duration: float
+        """
+        if not self.is_adaptive():
+            return
+        if not changed or duration > self._budget * self.interval:
+            self.interval = min(self.interval * self._backoff, self._max_interval)
+        else:
+            self.interval = self._min_interval
+
+    @property
+    def priority(self):
+        """Pollers with a higher priority run first, when due at the same time"""
+        return self._priority
+
+    @priority.setter
+    def priority(self, v):
+        self._priority = v
+
+    @property
+    def scheduler(self):
+        """The scheduler running this poller
+
+        :rtype: julesTk.utils.scheduler.Scheduler
+        """
+        return self.application.scheduler
+
+    @property
+    def deadline(self):
+        """Monotonic time at which the next tick is due"""
+        return self._deadline
+
+    @property
+    def lateness(self):
+        """Lateness of the last tick (in seconds)"""
+        return self._lateness
+
+    @property
+    def max_lateness(self):
+        """Largest lateness of all ticks (in seconds)"""
+        return self._max_lateness
+
+    @property
+    def mean_lateness(self):
+        """Average lateness of all ticks (in seconds)"""
+        result = 0.0
+        if self._ticks > 0:
+            result = self._total_lateness / self._ticks
+        return result
+
+    @property
+    def ticks(self):
+        """Number of ticks executed"""
+        return self._ticks
+
+    @property
+    def missed(self):
+        """Number of ticks dropped due to overruns"""
+        return self._missed
+
+    def reset_statistics(self):
+        """Reset the lateness measurements"""
+        self._lateness = 0.0
+        self._max_lateness = 0.0
+        self._total_lateness = 0.0
+        self._ticks = 0
+        self._missed = 0
+
     def is_polling(self):
         return self._polling is True
 
@@ -35,20 +194,308 @@ class Poller(Controller):
 
     def run(self):
         """Runs the poller"""
+        self._cancel()
         self.set_polling(True)
+        self._deadline = monotonic()
         self._update()
 
     def execute(self):
         raise NotImplementedError
 
     def _update(self):
+        self._job = None
         if self.is_polling():
+            start = monotonic()
+            self._measure(start)
+            result = None
             try:
-                self.execute()
+                result = self.execute()
             except KeyboardInterrupt:
                 self.set_polling(False)
-            self.view.after(int(self._interval * 1000), self._update)
+            finally:
+                # also schedule the next tick when execute raised, the error is reported by the scheduler
+                now = monotonic()
+                self.adapt(result is not False, now - start)
+                self._schedule(now)
+
+    def _measure(self, now):
+        """Record the lateness of a tick starting now"""
+        self._lateness = max(0.0, now - self._deadline)
+        self._max_lateness = max(self._max_lateness, self._lateness)
+        self._total_lateness += self._lateness
+        self._ticks += 1
+
+    def _next_deadline(self, now):
+        """Determine the deadline of the next tick, applying the overrun policy"""
+        deadline = self._deadline + self.interval
+        if now > deadline:
+            missed = int((now - deadline) // self.interval)
+            if self.overrun == self.OVERRUN_SKIP:
+                deadline += (missed + 1) * self.interval
+                self._missed += missed + 1
+            elif self.overrun == self.OVERRUN_COALESCE:
+                deadline = now
+                self._missed += missed
+        return deadline
+
+    def _schedule(self, now):
+        """Schedule the next tick"""
+        if self.is_polling():
+            self._deadline = self._next_deadline(now)
+            self._job = self.scheduler.schedule(self._update, self._deadline, priority=self.priority)
+
+    def _cancel(self):
+        """Cancel the scheduled tick"""
+        if self._job is not None:
+            self.scheduler.cancel(self._job)
+            self._job = None
 
     def _stop(self):
         self.set_polling(False)
+        self._cancel()
         super(Poller, self)._stop()
+
+
+def _timed(f, *args):
+    """Call f, returning the time it took and its result (module level, so it can be sent to a worker process)"""
+    start = monotonic()
+    result = f(*args)
+    return monotonic() - start, result
+
+
+class ThreadedPoller(Poller):
+    """A poller running `execute` in a worker thread, so slow (I/O) work does not block the GUI
+
+    `execute` runs in a thread of `executor` (by default a private pool with one thread, set another executor to
+    share a pool between pollers). Its result is handed to `process` in the main thread, where it is safe to update
+    the view. Errors raised by `execute` are handed to `failed`, which logs them.
+
+    The adaptive interval is based on the result of execute (False: nothing changed) and the time execute took in
+    the worker (excluding the time waiting in the executor and for delivery in the main thread).
+
+    Executions never overlap: when a tick is due while `execute` is still running, the `busy` policy decides:
+
+    - skip: Drop the tick (counted in `skipped`)
+    - queue: Run `execute` once more, directly after the current execution finishes
+    """
+
+    BUSY_SKIP = "skip"
+    BUSY_QUEUE = "queue"
+
+    BUSY_POLICIES = (BUSY_SKIP, BUSY_QUEUE)
+
+    def __init__(self, *args, **kwargs):
+        super(ThreadedPoller, self).__init__(*args, **kwargs)
+        self._executor = None
+        self._owns_executor = False
+        self._busy = self.BUSY_SKIP
+        self._future = None
+        self._queued = False
+        self._skipped = 0
+
+    @property
+    def executor(self):
+        """The executor running `execute`
+
+        :rtype: concurrent.futures.Executor
+        """
+        if self._executor is None:
+            self._executor = self._create_executor()
+            self._owns_executor = True
+        return self._executor
+
+    @executor.setter
+    def executor(self, executor):
+        """Use the given executor, it is not shut down when the poller stops"""
+        self._shutdown()
+        self._executor = executor
+        self._owns_executor = False
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def busy(self):
+        """Policy for ticks that are due while still executing"""
+        return self._busy
+
+    @busy.setter
+    def busy(self, policy):
+        if policy not in self.BUSY_POLICIES:
+            raise ValueError("Invalid busy policy: {}".format(policy))
+        self._busy = policy
+
+    @property
+    def skipped(self):
+        """Number of ticks dropped because the previous execution was still running"""
+        return self._skipped
+
+    def is_executing(self):
+        """Whether execute is running (or waiting to run) in the executor"""
+        return self._future is not None
+
+    @property
+    def dispatcher(self):
+        """The dispatcher delivering results in the main thread
+
+        :rtype: julesTk.utils.observe.Dispatcher
+        """
+        return self.application.dispatcher
+
+    def _update(self):
+        self._job = None
+        if self.is_polling():
+            self._measure(monotonic())
+            if not self.is_executing():
+                self._submit()
+            elif self.busy == self.BUSY_QUEUE:
+                self._queued = True
+            else:
+                self._skipped += 1
+            self._schedule(monotonic())
+
+    def _submit(self):
+        """Hand execute to the executor"""
+        self._queued = False
+        self._future = self._submit_execute()
+        self._future.add_done_callback(self._completed)
+
+    def _submit_execute(self):
+        """Submit the work to the executor
+
+        :rtype: concurrent.futures.Future
+        """
+        return self.executor.submit(_timed, self.execute)
+
+    def _completed(self, future):
+        """Called (in the worker thread) when execute is done"""
+        self.dispatcher.call(self._deliver, future)
+
+    def _deliver(self, future):
+        """Handle the outcome of execute in the main thread"""
+        if future is not self._future:
+            return
+        self._future = None
+        if future.cancelled() or not self.is_polling():
+            return
+        error = future.exception()
+        if error is not None:
+            self.failed(error)
+        else:
+            duration, result = future.result()
+            self.adapt(result is not False, duration)
+            self.process(result)
+        if self._queued and self.is_polling():
+            self._submit()
+
+    def process(self, result):
+        """Handle the result of execute in the main thread (e.g. update the view)"""
+        pass
+
+    def failed(self, error):
+        """Handle an error raised by execute in the main thread, logs the error by default"""
+        logging.getLogger(__name__).error(
+            "Error in {}.execute".format(self.__class__.__name__),
+            exc_info=(type(error), error, getattr(error, "__traceback__", None))
+        )
+
+    def _shutdown(self):
+        """Cancel pending work and shut down the executor (if owned), without waiting for running work"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+        self._queued = False
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._owns_executor = False
+
+    def _stop(self):
+        self.set_polling(False)
+        self._shutdown()
+        super(ThreadedPoller, self)._stop()
+
+
+class ProcessPoller(ThreadedPoller):
+    """A poller running CPU-bound work in a separate process, outside the reach of the GIL
+
+    Processes do not share memory: the work is done by `task`, a picklable (i.e. module level) function. It is
+    called with the (picklable) arguments returned by `arguments`, e.g. a copy of a window of the model. The result
+    is sent back and handed to `process` in the main thread, which by default adds it to the model
+    (using `model.extend`, as in `julesTk.model.timeseries.TimeSeriesModel`).
+
+    When stopped, the worker processes are terminated, so stopping the application never waits for running work.
+
+    Set `TASK` in a subclass (e.g. `TASK = module_function`) or assign `task`; the function is never bound to the
+    poller, as the poller itself can not be sent to another process.
+    """
+
+    TASK = None
+
+    def __init__(self, *args, **kwargs):
+        super(ProcessPoller, self).__init__(*args, **kwargs)
+        self._task = self._class_task()
+
+    def _class_task(self):
+        """The TASK of the class, without binding it to the poller"""
+        for cls in type(self).__mro__:
+            if "TASK" in cls.__dict__:
+                task = cls.__dict__["TASK"]
+                if isinstance(task, staticmethod):
+                    task = task.__get__(None, cls)
+                return task
+        return None
+
+    @property
+    def task(self):
+        """The function executed in the worker process"""
+        return self._task
+
+    @task.setter
+    def task(self, f):
+        self._task = f
+
+    def arguments(self):
+        """The arguments for task, collected in the main thread
+
+        :rtype: tuple
+        """
+        return ()
+
+    def run(self):
+        if self.task is None:
+            raise ValueError("No task to execute")
+        super(ProcessPoller, self).run()
+
+    def execute(self):
+        """Run the task in the current process"""
+        return self.task(*self.arguments())
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=1)
+
+    def _submit_execute(self):
+        return self.executor.submit(_timed, self.task, *self.arguments())
+
+    def process(self, result):
+        """Add the result to the model"""
+        if self.has_model():
+            self.model.extend(result)
+
+    def _shutdown(self):
+        # terminate before shutting down: shutdown forgets the worker processes
+        if self._executor is not None and self._owns_executor:
+            self._terminate(self._executor)
+        super(ProcessPoller, self)._shutdown()
+
+    @staticmethod
+    def _terminate(executor):
+        """Terminate the worker processes of the executor, so running work does not block the exit"""
+        terminate = getattr(executor, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+        else:
+            # older pythons do not offer a public interface to stop running work
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                if process.is_alive():
+                    process.terminate()
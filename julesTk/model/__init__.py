@@ -2,22 +2,148 @@
 
 from julesTk import ThreadSafeObject
 from julesTk.utils.observe import Observable
+import copy
+import itertools
 
 __author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
 
 
+class Snapshot(object):
+    """An immutable, versioned copy of the data of a model"""
+
+    __slots__ = ("_version", "_data", "_offset")
+
+    def __init__(self, version, data, offset=0):
+        """Initialize a snapshot
+
+        :param version: Version of the model when the snapshot was taken
+        :type version: int
+        :param data: Data of the model, should not be changed after the snapshot was taken
+        :param offset: Position of the first item in data, for models that drop old data
+        :type offset: int
+        """
+        self._version = version
+        self._data = data
+        self._offset = offset
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def offset(self):
+        return self._offset
+
+
+class SequenceSnapshot(object):
+    """A read-only view on the first items of a sequence that is only appended to
+
+    Used to take a snapshot of a list without copying it: items added to the list after taking the snapshot are
+    not part of the snapshot. Slicing returns a (copied) list.
+    """
+
+    __slots__ = ("_sequence", "_length")
+
+    def __init__(self, sequence, length=None):
+        if length is None:
+            length = len(sequence)
+        self._sequence = sequence
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            return self._sequence[start:stop:step]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Index out of range")
+        return self._sequence[index]
+
+    def __iter__(self):
+        return itertools.islice(self._sequence, self._length)
+
+    def __repr__(self):
+        return repr(self[:])
+
+
 class Model(Observable, ThreadSafeObject):
+    """A thread-safe, observable container of data
+
+    Models describe their modifications with `julesTk.utils.observe.Change` events, e.g.
+    `self.notify_observers(Change.append(start, count))`, so observers can update using only the difference.
+
+    Snapshots
+    ---------
+
+    Readers do not need the lock: `data` returns the data of the last published `Snapshot`. A snapshot is
+    published (in `publish`) every time observers are notified, each new snapshot increases `version`; inside a
+    batch, one snapshot is published when the coalesced notification is sent. Observers can compare versions to
+    skip work when nothing has changed. Until the first snapshot is published, `data` returns the data of the
+    model itself.
+
+    Subclasses must override `_freeze` to return a representation of the data that will not change when the model
+    is changed (e.g. a `SequenceSnapshot` or a read-only view); the default makes a (shallow) copy of the data on
+    every publish.
+    """
 
     def __init__(self):
         super(Model, self).__init__()
         self._data = None
+        self._version = 0
+        self._snapshot = Snapshot(0, None)
 
     @property
     def data(self):
         """RAW Representation of the data contained in the model"""
+        snapshot = self._snapshot
+        if snapshot.version == 0:
+            return self._data
+        return snapshot.data
+
+    @property
+    def snapshot(self):
+        """The last published snapshot of the data
+
+        :rtype: julesTk.model.Snapshot
+        """
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Version of the data, increases whenever a snapshot is published
+
+        :rtype: int
+        """
+        return self._snapshot.version
+
+    def _freeze(self):
+        """Return an immutable representation of the current data, override to avoid copying the data
+
+        :return: data and offset of the first item in data
+        :rtype: tuple
+        """
+        return copy.copy(self._data), 0
+
+    def publish(self):
+        """Make the current data available to readers"""
         with self.lock:
-            result = self._data
-        return result
+            self._version += 1
+            data, offset = self._freeze()
+            self._snapshot = Snapshot(self._version, data, offset)
+        return self._snapshot
+
+    def _notify_observers(self, changes):
+        # publish once per notification actually sent, not for every change inside a batch
+        self.publish()
+        super(Model, self)._notify_observers(changes)
 
     def update(self):
         """Request the model to update it self"""
@@ -0,0 +1,238 @@
+"""Models storing their samples in a memory-mapped file"""
+
+from __future__ import absolute_import
+from .timeseries import TimeSeriesModel
+import numpy
+import numpy.lib.format
+import os
+import re
+import struct
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+
+class MappedBuffer(object):
+    """An append-only buffer of samples, stored in a memory-mapped file
+
+    The file is a valid `.npy` file (version 1.0) holding a 1-dimensional array; it can be read using `numpy.load`.
+    The header is padded to a fixed size, so the length of the array can be updated in place after every append.
+    The file grows in chunks of `chunk_size` samples and is truncated to its exact size when the buffer is closed.
+
+    Samples are never loaded in memory: `view()` returns a (read-only) slice of the memory-map. Samples are never
+    overwritten, so views handed out before do not change: `clear()` does not rewind the buffer but continues
+    writing after the old samples. The old samples stay in the file, the file is never truncated below the samples
+    written to it. The position of the first sample after clearing is stored in the padding of the header (as a
+    comment), reopening the file only returns the samples written after clearing; `numpy.load` returns all samples.
+
+    The buffer has the same interface as `julesTk.model.timeseries.RingBuffer`, without a capacity limit.
+    """
+
+    HEADER_SIZE = 128
+    _START_PATTERN = re.compile(br"# start: (\d+)")
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path, dtype=None, chunk_size=None):
+        """Open or create the file
+
+        :param path: Location of the file, opened when it exists
+        :type path: str
+        :param dtype: NumPy data type of the samples; defaults to float for new files. Has to match the data type
+            of an existing file.
+        :param chunk_size: Number of samples to grow the file with
+        :type chunk_size: int
+        """
+        super(MappedBuffer, self).__init__()
+        if chunk_size is None:
+            chunk_size = self.CHUNK_SIZE
+        self._path = path
+        self._chunk_size = int(chunk_size)
+        self._length = 0
+        self._start = 0
+        self._header = None
+        self._map = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._dtype, self._length, self._start = self._read_header(path, dtype)
+        else:
+            self._dtype = numpy.dtype(float if dtype is None else dtype)
+            with open(path, "wb") as f:
+                f.write(self._format_header(0))
+        size = max(self._length + self._chunk_size, self._allocated())
+        self._open(size)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def capacity(self):
+        """Maximum number of samples, None as the buffer is unlimited"""
+        return None
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def total(self):
+        """Number of samples added to the buffer since it was opened or cleared"""
+        return self._length - self._start
+
+    @property
+    def offset(self):
+        """Absolute position of the oldest sample, always 0 as samples are never dropped"""
+        return 0
+
+    def __len__(self):
+        return self._length - self._start
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        result = self.view()
+        if dtype is not None:
+            result = result.astype(dtype)
+        return result
+
+    def is_closed(self):
+        return self._map is None
+
+    def _read_header(self, path, dtype):
+        with open(path, "rb") as f:
+            version = numpy.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, file_dtype = numpy.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, file_dtype = numpy.lib.format.read_array_header_2_0(f)
+            header_size = f.tell()
+            f.seek(0)
+            match = self._START_PATTERN.search(f.read(header_size))
+        if len(shape) != 1 or header_size != self.HEADER_SIZE:
+            raise ValueError("Unable to append to {}, not created by a {}".format(path, self.__class__.__name__))
+        if dtype is not None and numpy.dtype(dtype) != file_dtype:
+            raise ValueError("Data type {} does not match data type of file: {}".format(dtype, file_dtype))
+        start = 0 if match is None else min(int(match.group(1)), shape[0])
+        return file_dtype, shape[0], start
+
+    def _format_header(self, length):
+        """Create a `.npy` (version 1.0) header, padded to HEADER_SIZE bytes, storing the start in a comment"""
+        magic = numpy.lib.format.magic(1, 0)
+        size = self.HEADER_SIZE - len(magic) - 2
+        header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }} # start: {}".format(
+            numpy.lib.format.dtype_to_descr(self.dtype), length, self._start
+        )
+        header = header.ljust(size - 1) + "\n"
+        return magic + struct.pack("<H", size) + header.encode("latin1")
+
+    def _allocated(self):
+        """Number of samples that fit in the file"""
+        return (os.path.getsize(self.path) - self.HEADER_SIZE) // self.dtype.itemsize
+
+    def _open(self, size):
+        """(Re-)Map the file, growing it to hold `size` samples"""
+        if self._map is not None:
+            self._map.flush()
+        with open(self.path, "r+b") as f:
+            f.truncate(self.HEADER_SIZE + size * self.dtype.itemsize)
+        self._header = numpy.memmap(self.path, dtype=numpy.uint8, mode="r+", shape=(self.HEADER_SIZE,))
+        self._map = numpy.memmap(
+            self.path, dtype=self.dtype, mode="r+", offset=self.HEADER_SIZE, shape=(size,)
+        )
+
+    def _reserve(self, count):
+        """Make sure `count` more samples fit in the mapping"""
+        if self.is_closed():
+            raise ValueError("Buffer of {} is closed".format(self.path))
+        required = self._length + count
+        if required > len(self._map):
+            chunks = -(-required // self._chunk_size)
+            self._open(chunks * self._chunk_size)
+
+    def _update_header(self):
+        self._header[:] = numpy.frombuffer(self._format_header(self._length), dtype=numpy.uint8)
+
+    def append(self, value):
+        """Add one sample to the file"""
+        self._reserve(1)
+        self._map[self._length] = value
+        self._length += 1
+        self._update_header()
+
+    def extend(self, values):
+        """Add multiple samples to the file at once"""
+        values = numpy.asarray(values, dtype=self.dtype).ravel()
+        count = len(values)
+        self._reserve(count)
+        self._map[self._length:self._length + count] = values
+        self._length += count
+        self._update_header()
+
+    def clear(self):
+        """Remove all samples from the buffer"""
+        # do not rewind, samples in views handed out before should stay intact
+        self._start = self._length
+        if not self.is_closed():
+            self._update_header()
+
+    def view(self):
+        """A read-only view on the samples in the file
+
+        :rtype: numpy.ndarray
+        """
+        result = self._map[self._start:self._length] if self._map is not None else numpy.empty(0, dtype=self.dtype)
+        result = result.view(numpy.ndarray)
+        result.flags.writeable = False
+        return result
+
+    def window(self, start=None, stop=None):
+        """A read-only view on the samples with positions between start and stop
+
+        :rtype: numpy.ndarray
+        """
+        return self.view()[start:stop]
+
+    def flush(self):
+        """Write changes to disk"""
+        if not self.is_closed():
+            self._header.flush()
+            self._map.flush()
+
+    def close(self):
+        """Write all samples to disk and truncate the file to the size of the samples
+
+        Views handed out before stay valid, they never extend beyond the written samples.
+        """
+        if not self.is_closed():
+            self.flush()
+            self._header = None
+            self._map = None
+            with open(self.path, "r+b") as f:
+                f.truncate(self.HEADER_SIZE + self._length * self.dtype.itemsize)
+
+
+class MappedTimeSeriesModel(TimeSeriesModel):
+    """A time series model storing all its samples in a memory-mapped `.npy` file
+
+    Opening an existing file makes its samples available immediately, without reading them.
+    Call `close()` when done, to truncate the file to its final size.
+    """
+
+    def __init__(self, path, dtype=None, chunk_size=None):
+        super(MappedTimeSeriesModel, self).__init__(buffer=MappedBuffer(path, dtype=dtype, chunk_size=chunk_size))
+
+    @property
+    def path(self):
+        return self.buffer.path
+
+    def flush(self):
+        """Write changes to disk"""
+        with self.lock:
+            self.buffer.flush()
+
+    def close(self):
+        """Close the file"""
+        with self.lock:
+            self.buffer.close()
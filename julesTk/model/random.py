@@ -1,38 +1,131 @@
 
 from __future__ import absolute_import
-from . import Model
+from . import Model, SequenceSnapshot
+from julesTk.utils.observe import Change
 import random
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class RandomModel(Model):
+    """Generates random numbers from a gaussian distribution
+
+    By default all generated numbers are kept in a list. Give a capacity to only keep the last `capacity` numbers,
+    stored in a `julesTk.model.timeseries.RingBuffer` (requires numpy). Changes use absolute indices, which no longer
+    match the indices in `data` once numbers are dropped: use `window` (or subtract `offset`).
+
+    Use `update(n)` to add many numbers at once: they are drawn in one call to `generate(n)` (vectorized when numpy is
+    available), stored while holding the lock once and observers are notified once.
+    """
 
-    def __init__(self, mean=0, std=1):
+    def __init__(self, mean=0, std=1, capacity=None):
         super(RandomModel, self).__init__()
         self._mean = mean
         self._std = std
+        self._capacity = capacity
         self.reset()
 
+    @property
+    def capacity(self):
+        """Maximum number of numbers kept, or None when all numbers are kept"""
+        return self._capacity
+
+    @property
+    def offset(self):
+        """Index of the first number in data, numbers before it were dropped"""
+        return self.snapshot.offset
+
+    def window(self, start=None, stop=None):
+        """The numbers with (absolute) indices between start and stop, as used by `Change.append`
+
+        Indices of numbers no longer in the model are ignored.
+        """
+        snapshot = self.snapshot
+        offset, total = snapshot.offset, snapshot.offset + len(snapshot.data)
+        if start is None:
+            start = offset
+        if stop is None:
+            stop = total
+        start = min(max(start, offset), total) - offset
+        stop = min(max(stop, offset), total) - offset
+        return snapshot.data[start:max(start, stop)]
+
     @property
     def mean(self):
+        return self._mean
+
+    @mean.setter
+    def mean(self, v):
         with self.lock:
-            result = self._mean
-        return result
+            self._mean = v
+        self.notify_observers(Change.attribute("mean"))
 
     @property
     def std(self):
+        return self._std
+
+    @std.setter
+    def std(self, v):
         with self.lock:
-            result = self._std
+            self._std = v
+        self.notify_observers(Change.attribute("std"))
+
+    def _freeze(self):
+        if self.capacity is not None:
+            result = self._data.view(), self._data.offset
+        else:
+            result = SequenceSnapshot(self._data), 0
+        return result
+
+    def _create_storage(self):
+        result = []
+        if self.capacity is not None:
+            from julesTk.model.timeseries import RingBuffer
+            result = RingBuffer(self.capacity)
         return result
 
     @Model.observed
     def reset(self):
         with self.lock:
-            self._data = []
+            self._data = self._create_storage()
+        self.notify_observers(Change.reset())
 
-    def generate(self):
-        return random.gauss(self.mean, self.std)
+    def generate(self, n=None):
+        """Draw random numbers
 
-    @Model.observed
-    def update(self):
+        :param n: Number of values to draw, or None to draw a single value
+        :type n: None | int
+        :return: The value or a sequence of n values
+        :rtype: float | list[float] | numpy.ndarray
+        """
+        with self.read_lock:
+            mean, std = self._mean, self._std
+        result = self._draw(mean, std, 1 if n is None else n)
+        if n is None:
+            result = result[0]
+        return result
+
+    def _draw(self, mean, std, n):
+        if numpy is not None:
+            result = numpy.random.normal(mean, std, n)
+        else:
+            result = [random.gauss(mean, std) for _ in range(n)]
+        return result
+
+    @Model.batched
+    def update(self, n=1):
+        """Add n new random numbers"""
+        if n < 1:
+            return
+        values = self.generate(n)
+        if self.capacity is None and hasattr(values, "tolist"):
+            values = values.tolist()
         with self.lock:
-            self._data.append(self.generate())
+            start = len(self._data)
+            if self.capacity is not None:
+                start = self._data.total
+            self._data.extend(values)
+        self.notify_observers(Change.append(start, n))
@@ -0,0 +1,232 @@
+"""Models storing a bounded series of samples in NumPy arrays"""
+
+from __future__ import absolute_import
+from . import Model
+from julesTk.utils.observe import Change
+import numpy
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+
+class RingBuffer(object):
+    """A fixed capacity buffer of samples, dropping the oldest samples when full
+
+    The samples are stored in a preallocated array of twice the capacity. New samples are written after the last
+    sample, once the end of the array is reached the last (capacity) samples are moved to the start of a new array.
+    Appending is therefore O(1) (amortized) and the samples are always contiguous, so `view()` never copies.
+
+    Samples are never overwritten in place, a view obtained from the buffer will not change when samples are added.
+
+    Positions
+    ---------
+
+    `total` counts all samples ever added, so the samples in the buffer have the absolute positions
+    `offset` to `total`. Use `window(start, stop)` to select samples by their absolute position.
+    """
+
+    def __init__(self, capacity, dtype=float):
+        """Initialize an empty buffer
+
+        :param capacity: Maximum number of samples kept in the buffer
+        :type capacity: int
+        :param dtype: NumPy data type of the samples
+        """
+        super(RingBuffer, self).__init__()
+        if capacity < 1:
+            raise ValueError("Invalid capacity: {}".format(capacity))
+        self._capacity = int(capacity)
+        self._dtype = numpy.dtype(dtype)
+        self._buffer = self._allocate()
+        self._start = 0
+        self._stop = 0
+        self._total = 0
+
+    @property
+    def capacity(self):
+        """Maximum number of samples in the buffer"""
+        return self._capacity
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def total(self):
+        """Number of samples added to the buffer since it was created or cleared"""
+        return self._total
+
+    @property
+    def offset(self):
+        """Absolute position of the oldest sample in the buffer"""
+        return self._total - len(self)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        result = self.view()
+        if dtype is not None:
+            result = result.astype(dtype)
+        return result
+
+    def _allocate(self):
+        return numpy.empty(2 * self.capacity, dtype=self.dtype)
+
+    def _compact(self, keep):
+        """Move the last `keep` samples to the start of a new array"""
+        keep = min(keep, len(self))
+        buffer = self._allocate()
+        buffer[:keep] = self._buffer[self._stop - keep:self._stop]
+        self._buffer = buffer
+        self._start = 0
+        self._stop = keep
+
+    def append(self, value):
+        """Add one sample to the buffer"""
+        if self._stop == len(self._buffer):
+            self._compact(self.capacity - 1)
+        self._buffer[self._stop] = value
+        self._stop += 1
+        self._start = max(self._start, self._stop - self.capacity)
+        self._total += 1
+
+    def extend(self, values):
+        """Add multiple samples to the buffer at once"""
+        values = numpy.asarray(values, dtype=self.dtype).ravel()
+        count = len(values)
+        if count > self.capacity:
+            values = values[-self.capacity:]
+        size = len(values)
+        if self._stop + size > len(self._buffer):
+            self._compact(self.capacity - size)
+        self._buffer[self._stop:self._stop + size] = values
+        self._stop += size
+        self._start = max(self._start, self._stop - self.capacity)
+        self._total += count
+
+    def clear(self):
+        """Remove all samples"""
+        # do not rewind, samples in views handed out before should stay intact
+        self._start = self._stop
+        self._total = 0
+
+    def view(self):
+        """A read-only view on the samples in the buffer (from oldest to newest)
+
+        :rtype: numpy.ndarray
+        """
+        result = self._buffer[self._start:self._stop]
+        result.flags.writeable = False
+        return result
+
+    def window(self, start=None, stop=None):
+        """A read-only view on the samples with absolute positions between start and stop
+
+        Positions of samples no longer in the buffer are ignored.
+
+        :rtype: numpy.ndarray
+        """
+        offset = self.offset
+        if start is None:
+            start = offset
+        if stop is None:
+            stop = self.total
+        start = min(max(start, offset), self.total) - offset
+        stop = min(max(stop, offset), self.total) - offset
+        return self.view()[start:max(start, stop)]
+
+
+class TimeSeriesModel(Model):
+    """A model storing the last `capacity` samples of a series
+
+    Observers are notified with `Change.append(start, count)` using the absolute position of the samples,
+    use `window(change.start, change.stop)` to obtain the new samples.
+
+    Samples are stored in a `RingBuffer`, unless another buffer (with the same interface) is given.
+    """
+
+    def __init__(self, capacity=10000, dtype=float, buffer=None):
+        super(TimeSeriesModel, self).__init__()
+        if buffer is None:
+            buffer = RingBuffer(capacity, dtype=dtype)
+        self._data = buffer
+        self.publish()
+
+    def _freeze(self):
+        return self._data.view(), self._data.offset
+
+    @property
+    def buffer(self):
+        """The buffer storing the samples
+
+        :rtype: julesTk.model.timeseries.RingBuffer
+        """
+        return self._data
+
+    @property
+    def capacity(self):
+        """Maximum number of samples kept, None if unlimited"""
+        return self._data.capacity
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def offset(self):
+        """Absolute position of the first sample in data"""
+        return self.snapshot.offset
+
+    @property
+    def total(self):
+        """Number of samples added since the model was created or reset"""
+        snapshot = self.snapshot
+        return snapshot.offset + len(snapshot.data)
+
+    def window(self, start=None, stop=None):
+        """View on the samples with absolute positions between start and stop
+
+        Positions of samples no longer in the model are ignored.
+
+        :rtype: numpy.ndarray
+        """
+        snapshot = self.snapshot
+        offset, total = snapshot.offset, snapshot.offset + len(snapshot.data)
+        if start is None:
+            start = offset
+        if stop is None:
+            stop = total
+        start = min(max(start, offset), total) - offset
+        stop = min(max(stop, offset), total) - offset
+        return snapshot.data[start:max(start, stop)]
+
+    @Model.observed
+    def append(self, value):
+        """Add a sample"""
+        with self.lock:
+            start = self._data.total
+            self._data.append(value)
+        self.notify_observers(Change.append(start, 1))
+
+    @Model.batched
+    def extend(self, values):
+        """Add multiple samples"""
+        with self.lock:
+            start = self._data.total
+            self._data.extend(values)
+            count = self._data.total - start
+        if count > 0:
+            self.notify_observers(Change.append(start, count))
+
+    @Model.observed
+    def reset(self):
+        """Remove all samples"""
+        with self.lock:
+            self._data.clear()
+        self.notify_observers(Change.reset())
@@ -1,15 +1,64 @@
 """A simple view with a text box, to display log messages obtained from the stream handler"""
 
 from julesTk import view
+from array import array
+from collections import deque
+import logging
+import re
+import sys
+import time
+if sys.version_info[0] < 3:
+    import tkFont as tkfont
+else:
+    from tkinter import font as tkfont
 
 __author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
 
+try:
+    array("q")
+    _OFFSET_TYPE = "q"
+except ValueError:
+    # python 2
+    _OFFSET_TYPE = "l"
+
 
 class LogView(view.Frame):
-    """A view to show log messages"""
+    """A view to show log messages
+
+    `write` may be called from any thread (e.g. by a `logging.StreamHandler`): messages are queued and added to the
+    text widget in the main thread, every `flush_interval` seconds. Each flush adds at most `batch_size` messages,
+    using a single insert.
+
+    With `max_lines` set, the oldest lines are removed once the text exceeds `max_lines` lines; `trim_size` lines
+    at once, so trimming does not happen on every flush. When scrolled to the bottom the view follows new messages,
+    otherwise the shown lines stay in place while messages are added and old lines removed.
+    """
+
+    FLUSH_INTERVAL = 0.05
+    BATCH_SIZE = 1000
+
+    def __init__(self, parent, flush_interval=None, batch_size=None, max_lines=None):
+        """Initialize the view
 
-    def __init__(self, parent):
+        :param flush_interval: Number of seconds between adding the queued messages to the text widget
+        :type flush_interval: float
+        :param batch_size: Maximum number of messages to add at once
+        :type batch_size: int
+        :param max_lines: Maximum number of lines to keep, None to keep all lines
+        :type max_lines: None | int
+        """
         super(LogView, self).__init__(parent=parent)
+        if flush_interval is None:
+            flush_interval = self.FLUSH_INTERVAL
+        if batch_size is None:
+            batch_size = self.BATCH_SIZE
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._queue = deque()
+        self._flush_job = None
+        self._max_lines = None
+        self._trim_size = None
+        self.max_lines = max_lines
 
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -32,23 +81,639 @@ class LogView(view.Frame):
 
         xscroll.config(command=self._text.xview)
         yscroll.config(command=self._text.yview)
+        self._yscroll = yscroll
+        self._schedule_flush()
 
     @property
     def text(self):
         """The text widget"""
         return self._text
 
+    @property
+    def flush_interval(self):
+        """Number of seconds between adding the queued messages to the text widget"""
+        return self._flush_interval
+
+    @flush_interval.setter
+    def flush_interval(self, v):
+        if v <= 0:
+            raise ValueError("Invalid flush interval: {}".format(v))
+        self._flush_interval = v
+
+    @property
+    def batch_size(self):
+        """Maximum number of messages added at once"""
+        return self._batch_size
+
+    @batch_size.setter
+    def batch_size(self, v):
+        if v < 1:
+            raise ValueError("Invalid batch size: {}".format(v))
+        self._batch_size = v
+
+    @property
+    def max_lines(self):
+        """Maximum number of lines to keep, None to keep all lines"""
+        return self._max_lines
+
+    @max_lines.setter
+    def max_lines(self, v):
+        if v is not None and v < 1:
+            raise ValueError("Invalid maximum number of lines: {}".format(v))
+        self._max_lines = v
+        if v is not None and self._trim_size is None:
+            self._trim_size = max(v // 10, 1)
+
+    @property
+    def trim_size(self):
+        """Number of lines below max_lines to trim to, when exceeding max_lines"""
+        return self._trim_size
+
+    @trim_size.setter
+    def trim_size(self, v):
+        if v < 0:
+            raise ValueError("Invalid trim size: {}".format(v))
+        self._trim_size = v
+
+    def line_count(self):
+        """Number of lines in the text widget"""
+        return int(self._text.index("end-1c").split(".")[0])
+
+    def is_following(self):
+        """Whether the view is scrolled to the bottom, following new messages"""
+        return self._text.yview()[1] >= 1.0
+
+    def pending(self):
+        """Number of messages waiting to be shown"""
+        return len(self._queue)
+
     def write(self, message):
-        """Write a message to the console"""
-        self._text.config(state="normal")
-        self._text.insert(view.tk.END, message)
-        self._text.config(state="disabled")
+        """Write a message to the console, safe to call from any thread"""
+        self._queue.append(message)
 
     def flush(self):
+        """Messages are shown by the next scheduled flush, as this may be called from any thread"""
         pass
 
+    def process(self):
+        """Add (at most batch_size) queued messages to the text widget, call from the main thread
+
+        :return: Number of messages added
+        :rtype: int
+        """
+        messages = []
+        try:
+            while len(messages) < self.batch_size:
+                messages.append(self._queue.popleft())
+        except IndexError:
+            pass
+        if len(messages) > 0:
+            self._insert("".join(messages))
+        return len(messages)
+
+    def _insert(self, text):
+        follow = self.is_following()
+        self._text.config(state="normal")
+        self._text.insert(view.tk.END, text)
+        self._trim()
+        self._text.config(state="disabled")
+        if follow:
+            self._text.see(view.tk.END)
+
+    def _trim(self):
+        """Remove the oldest lines when exceeding max_lines, keeping the shown lines in place"""
+        count = self.line_count()
+        if self.max_lines is None or count <= self.max_lines:
+            return
+        remove = count - max(self.max_lines - self.trim_size, 0)
+        top = int(self._text.index("@0,0").split(".")[0])
+        self._text.delete("1.0", "{}.0".format(remove + 1))
+        self._text.yview("{}.0".format(max(top - remove, 1)))
+
+    def _schedule_flush(self):
+        self._flush_job = self.after(int(round(self.flush_interval * 1000)), self._perform_flush)
+
+    def _perform_flush(self):
+        try:
+            self.process()
+        finally:
+            self._schedule_flush()
+
+    def destroy(self):
+        if self._flush_job is not None:
+            self.after_cancel(self._flush_job)
+            self._flush_job = None
+        super(LogView, self).destroy()
+
     def clear(self, event=None):
-        """Remove all messages from the console"""
+        """Remove all messages from the console, including the queued messages"""
+        self._queue.clear()
         self._text.config(state="normal")
         self._text.delete(1.0, view.tk.END)
         self._text.config(state="disabled")
+
+
+class LineStore(object):
+    """An append-only store of lines, kept in memory
+
+    Text is added using `append`, a line is stored once its newline is added.
+    """
+
+    def __init__(self):
+        super(LineStore, self).__init__()
+        self._lines = []
+        self._partial = ""
+
+    def __len__(self):
+        """Number of (complete) lines"""
+        return len(self._lines)
+
+    def append(self, text):
+        """Add text to the store"""
+        parts = (self._partial + text).split("\n")
+        self._partial = parts.pop()
+        self._lines.extend(line + "\n" for line in parts)
+
+    def lines(self, start, stop):
+        """The lines between start and stop, including their newline
+
+        :rtype: list[str]
+        """
+        return self._lines[start:stop]
+
+    def clear(self):
+        """Remove all lines"""
+        self._lines = []
+        self._partial = ""
+
+    def close(self):
+        pass
+
+
+class FileLineStore(LineStore):
+    """An append-only store of lines, kept in a file
+
+    Only the offsets of the lines are kept in memory, lines are read from the file when requested. An existing file
+    is indexed when opened, the text is appended to it.
+    """
+
+    def __init__(self, path, encoding="utf-8"):
+        super(FileLineStore, self).__init__()
+        self._path = path
+        self._encoding = encoding
+        self._file = open(path, "a+b")
+        self._offsets = array(_OFFSET_TYPE, [0])
+        self._size = 0
+        self._file.seek(0)
+        for line in self._file:
+            self._size += len(line)
+            if line.endswith(b"\n"):
+                self._offsets.append(self._size)
+
+    @property
+    def path(self):
+        return self._path
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def append(self, text):
+        data = text.encode(self._encoding)
+        self._file.write(data)
+        index = data.find(b"\n")
+        while index >= 0:
+            self._offsets.append(self._size + index + 1)
+            index = data.find(b"\n", index + 1)
+        self._size += len(data)
+
+    def lines(self, start, stop):
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return []
+        self._file.flush()
+        self._file.seek(self._offsets[start])
+        data = self._file.read(self._offsets[stop] - self._offsets[start])
+        # only split on newlines (like the offsets), splitlines also splits on e.g. \r and \x0c
+        return [line.decode(self._encoding, "replace") + "\n" for line in data.split(b"\n")[:-1]]
+
+    def clear(self):
+        self._file.seek(0)
+        self._file.truncate()
+        self._offsets = array(_OFFSET_TYPE, [0])
+        self._size = 0
+
+    def close(self):
+        self._file.close()
+
+
+LEVELS = {
+    "CRITICAL": logging.CRITICAL,
+    "FATAL": logging.CRITICAL,
+    "ERROR": logging.ERROR,
+    "WARNING": logging.WARNING,
+    "WARN": logging.WARNING,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG,
+}
+_LEVEL_PATTERN = re.compile(r"\b({})\b".format("|".join(LEVELS.keys())))
+
+
+def parse_level(line):
+    """The level of a log message, found by the first level name in the line (see LEVELS)
+
+    :return: The level, `logging.NOTSET` if the line does not contain a level name
+    :rtype: int
+    """
+    match = _LEVEL_PATTERN.search(line)
+    return logging.NOTSET if match is None else LEVELS[match.group(1)]
+
+
+class LogIndex(object):
+    """Metadata of the lines in a store: their level and time of arrival
+
+    Levels are parsed from the text (see `parse_level`), use a formatter including the level name, e.g.
+    `logging.Formatter("%(asctime)s %(levelname)s %(message)s")`.
+    """
+
+    def __init__(self):
+        super(LogIndex, self).__init__()
+        self._levels = array("B")
+        self._timestamps = array("d")
+
+    def __len__(self):
+        return len(self._levels)
+
+    @property
+    def levels(self):
+        """Level of every line
+
+        :rtype: array.array
+        """
+        return self._levels
+
+    def level(self, index):
+        return self._levels[index]
+
+    def timestamp(self, index):
+        """Time (`time.time`) at which the line was added, NaN when unknown (e.g. lines read from an existing file)"""
+        return self._timestamps[index]
+
+    def extend(self, lines, timestamp=None):
+        """Add the metadata of new lines"""
+        if timestamp is None:
+            timestamp = time.time()
+        self._levels.extend(parse_level(line) for line in lines)
+        self._timestamps.extend(timestamp for _ in lines)
+
+    def clear(self):
+        self._levels = array("B")
+        self._timestamps = array("d")
+
+
+class LogFilter(object):
+    """Selects lines by minimum level and a regular expression (or substring)"""
+
+    def __init__(self, level=logging.NOTSET, pattern=None, regex=True):
+        super(LogFilter, self).__init__()
+        self._level = level
+        self._pattern = pattern
+        self._expression = None
+        if pattern is not None:
+            self._expression = re.compile(pattern if regex else re.escape(pattern))
+
+    @property
+    def level(self):
+        return self._level
+
+    @property
+    def pattern(self):
+        return self._pattern
+
+    def is_active(self):
+        """Whether the filter hides any lines"""
+        return self.level > logging.NOTSET or self.pattern is not None
+
+    def search(self, line):
+        """Whether the line contains the pattern"""
+        return self._expression is None or self._expression.search(line) is not None
+
+    def matches(self, line, level):
+        """Whether a line with the given level passes the filter"""
+        return level >= self.level and self.search(line)
+
+
+class VirtualLogView(LogView):
+    """A log view keeping its lines in a `LineStore`, for logs with (many) millions of lines
+
+    The text widget only holds the visible lines, plus `margin` lines above and below them; these are rendered again
+    when scrolling beyond the margin. The scrollbar is driven by the number of lines in the store. Messages are
+    queued and flushed like in `LogView`, but `max_lines` is not used: all lines are kept in the store.
+
+    Filtering
+    ---------
+
+    `set_filter` only shows the lines with a minimum level and/or matching a regular expression (or substring). The
+    level of each line is parsed once, when it is added, and kept in a `LogIndex`: a level filter does not read the
+    text of the lines, a pattern is only tested on the lines with a high enough level. Lines added while a filter is
+    set are tested once, when they are added. Only the shown lines are rendered.
+
+    Lines already in the store (e.g. an existing file) are indexed, and the lines are filtered, in chunks of
+    `SCAN_SIZE` lines scheduled with `after`: `set_filter` only scans the first chunk, the view (and scrollbar)
+    grow while the rest of the lines are scanned. Lines added meanwhile keep the time they were added at.
+    """
+
+    MARGIN = 50
+    WHEEL_LINES = 3
+    SCAN_SIZE = 10000
+
+    def __init__(self, parent, store=None, flush_interval=None, batch_size=None, margin=None):
+        """Initialize the view
+
+        :param store: Store holding the lines, defaults to an in-memory store
+        :type store: None | julesTk.utils.console.LineStore
+        :param margin: Number of lines rendered above and below the visible lines
+        :type margin: int
+        """
+        super(VirtualLogView, self).__init__(parent, flush_interval=flush_interval, batch_size=batch_size)
+        if store is None:
+            store = LineStore()
+        if margin is None:
+            margin = self.MARGIN
+        self._store = store
+        self._scan_job = None
+        self._scanned = 0
+        self._arrivals = deque()
+        self._margin = margin
+        self._first = 0
+        self._rendered = (0, 0)
+        self._following = True
+        self._line_height = None
+        self._rows = 1
+        self._index = LogIndex()
+        self._filter = LogFilter()
+        self._matches = None
+        self._text.config(yscrollcommand="")
+        self._yscroll.config(command=self._on_scroll)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self._text.bind(sequence, self._on_wheel)
+        self._text.bind("<Configure>", self._on_configure)
+        self._schedule_scan()
+
+    @property
+    def store(self):
+        """The store holding the lines
+
+        :rtype: julesTk.utils.console.LineStore
+        """
+        return self._store
+
+    @store.setter
+    def store(self, store):
+        """Show the lines of another store, indexing (and filtering) its lines"""
+        self._cancel_scan()
+        self._store = store
+        self._index = LogIndex()
+        self._arrivals.clear()
+        self._update_matches()
+        self._first = self._row_count() if self.is_following() else 0
+        self._rendered = (0, 0)
+        self._schedule_scan()
+        self.refresh()
+
+    @property
+    def margin(self):
+        """Number of lines rendered above and below the visible lines"""
+        return self._margin
+
+    @property
+    def first_line(self):
+        """Index of the first visible line"""
+        return self._first
+
+    def visible_lines(self):
+        """Number of lines fitting in the text widget (updated when the widget is resized)"""
+        return self._rows
+
+    def _on_configure(self, event):
+        """Measure the number of visible lines, when resized or reconfigured"""
+        font = tkfont.Font(font=self._text.cget("font"))
+        self._line_height = max(font.metrics("linespace"), 1)
+        self._rows = max(event.height // self._line_height, 1)
+        self.refresh()
+
+    def line_count(self):
+        return len(self.store)
+
+    def is_following(self):
+        return self._following
+
+    @property
+    def index(self):
+        """Level and time of arrival of the lines in the store
+
+        :rtype: julesTk.utils.console.LogIndex
+        """
+        return self._index
+
+    @property
+    def filter(self):
+        """The filter selecting the shown lines
+
+        :rtype: julesTk.utils.console.LogFilter
+        """
+        return self._filter
+
+    def set_filter(self, level=logging.NOTSET, pattern=None, regex=True):
+        """Only show the lines with at least the given level, containing the pattern
+
+        :param level: Minimum level of the shown lines
+        :type level: int
+        :param pattern: Regular expression (or substring, if regex is False) to search in the lines, None to show
+            lines with any text
+        :type pattern: None | str
+        """
+        self._filter = LogFilter(level=level, pattern=pattern, regex=regex)
+        self._update_matches()
+        if not self.is_following():
+            self._first = 0
+        else:
+            self._first = self._row_count()
+        self._rendered = (0, 0)
+        self.refresh()
+
+    def _update_matches(self):
+        """Select the lines passing the filter, scanning the first chunk of lines
+
+        The remaining lines are scanned later, see `_scan`.
+        """
+        self._cancel_scan()
+        self._scanned = 0
+        if not self.filter.is_active():
+            self._matches = None
+            return
+        self._matches = array(_OFFSET_TYPE)
+        if not self.is_following():
+            # the view shows the first lines
+            self._scan_lines(self.SCAN_SIZE)
+        self._schedule_scan()
+
+    def is_scanned(self):
+        """Whether all lines in the store are indexed and filtered"""
+        if len(self.index) < len(self.store):
+            return False
+        return self._matches is None or self._scanned == len(self.index)
+
+    def _index_lines(self, size):
+        """Index (at most size) lines of the store not indexed yet"""
+        start = len(self.index)
+        stop = min(start + size, len(self.store))
+        while start < stop:
+            # lines added while scanning have the time of their arrival, older lines have no timestamp
+            while len(self._arrivals) > 1 and self._arrivals[1][0] <= start:
+                self._arrivals.popleft()
+            timestamp, end = float("nan"), stop
+            if len(self._arrivals) > 0 and self._arrivals[0][0] <= start:
+                timestamp = self._arrivals[0][1]
+                if len(self._arrivals) > 1:
+                    end = min(end, self._arrivals[1][0])
+            elif len(self._arrivals) > 0:
+                end = min(end, self._arrivals[0][0])
+            self.index.extend(self.store.lines(start, end), timestamp=timestamp)
+            start = end
+        if len(self.index) == len(self.store):
+            self._arrivals.clear()
+
+    def _scan_lines(self, size):
+        """Filter (at most size) lines not scanned yet, only reads the text of lines with a high enough level"""
+        start = self._scanned
+        stop = min(start + size, len(self.index))
+        levels = self.index.levels
+        candidates = [i for i in range(start, stop) if levels[i] >= self.filter.level]
+        if self.filter.pattern is None:
+            self._matches.extend(candidates)
+        elif len(candidates) > 0:
+            lines = self.store.lines(candidates[0], candidates[-1] + 1)
+            self._matches.extend(
+                i for i in candidates if self.filter.search(lines[i - candidates[0]])
+            )
+        self._scanned = stop
+
+    def _scan(self):
+        """Index and filter the next chunk of lines, schedules the next chunk when lines are left"""
+        self._scan_job = None
+        self._index_lines(self.SCAN_SIZE)
+        if self._matches is not None:
+            self._scan_lines(self.SCAN_SIZE)
+            if self.is_following():
+                self._first = self._row_count()
+        self._schedule_scan()
+        self.refresh()
+
+    def _schedule_scan(self):
+        if self._scan_job is None and not self.is_scanned():
+            self._scan_job = self.after(1, self._scan)
+
+    def _cancel_scan(self):
+        if self._scan_job is not None:
+            self.after_cancel(self._scan_job)
+            self._scan_job = None
+
+    def _row_count(self):
+        """Number of lines that can be shown"""
+        return len(self.store) if self._matches is None else len(self._matches)
+
+    def _row_lines(self, start, stop):
+        """The shown lines between start and stop"""
+        if self._matches is None:
+            return self.store.lines(start, stop)
+        return [self.store.lines(i, i + 1)[0] for i in self._matches[start:stop]]
+
+    def _insert(self, text):
+        start = len(self.store)
+        self.store.append(text)
+        if len(self.index) < start:
+            # the lines are indexed (and filtered) with the lines left by the scan
+            self._arrivals.append((start, time.time()))
+        else:
+            lines = self.store.lines(start, len(self.store))
+            self.index.extend(lines)
+            if self._matches is not None and self._scanned == start:
+                self._matches.extend(
+                    start + i for i, line in enumerate(lines) if self.filter.matches(line, self.index.level(start + i))
+                )
+                self._scanned = len(self.index)
+        self._schedule_scan()
+        if self.is_following():
+            self._first = self._row_count()
+        self.refresh()
+
+    def scroll_to(self, line):
+        """Show the lines starting at the given line"""
+        self._first = line
+        self.refresh()
+
+    def refresh(self):
+        """Render the visible lines (when needed) and update the scrollbar"""
+        count = self._row_count()
+        rows = self.visible_lines()
+        first = min(max(self._first, 0), max(count - rows, 0))
+        self._first = first
+        rendered_start, rendered_stop = self._rendered
+        if first < rendered_start or min(first + rows, count) > rendered_stop:
+            self._render(max(first - self.margin, 0), min(first + rows + self.margin, count))
+        self._text.yview("{}.0".format(first - self._rendered[0] + 1))
+        self._following = first + rows >= count
+        if count == 0:
+            self._yscroll.set(0.0, 1.0)
+        else:
+            self._yscroll.set(first / float(count), min(first + rows, count) / float(count))
+
+    def _render(self, start, stop):
+        """Put the lines between start and stop in the text widget"""
+        rendered_start, rendered_stop = self._rendered
+        self._text.config(state="normal")
+        if rendered_start < rendered_stop and rendered_start <= start <= rendered_stop <= stop:
+            # moved towards the end (e.g. following new lines): add lines at the tail and remove lines at the head
+            if stop > rendered_stop:
+                self._text.insert(view.tk.END, "".join(self._row_lines(rendered_stop, stop)))
+            if start > rendered_start:
+                self._text.delete("1.0", "{}.0".format(start - rendered_start + 1))
+        else:
+            self._text.delete("1.0", view.tk.END)
+            self._text.insert(view.tk.END, "".join(self._row_lines(start, stop)))
+        self._text.config(state="disabled")
+        self._rendered = (start, stop)
+
+    def _on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self._first = int(float(value) * self._row_count())
+        elif action == "scroll":
+            lines = int(value)
+            if unit.startswith("page"):
+                lines *= self.visible_lines()
+            self._first += lines
+        self.refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._first -= self.WHEEL_LINES
+        else:
+            self._first += self.WHEEL_LINES
+        self.refresh()
+        return "break"
+
+    def clear(self, event=None):
+        """Remove all messages from the console and the store"""
+        super(VirtualLogView, self).clear(event)
+        self._cancel_scan()
+        self.store.clear()
+        self.index.clear()
+        self._arrivals.clear()
+        self._update_matches()
+        self._first = 0
+        self._rendered = (0, 0)
+        self.refresh()
+
+    def destroy(self):
+        self._cancel_scan()
+        super(VirtualLogView, self).destroy()
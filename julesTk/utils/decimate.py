@@ -0,0 +1,262 @@
+"""Reduce long series of samples to the number of points that can be shown on screen
+
+A `MinMaxPyramid` keeps the minimum and maximum of blocks of samples at multiple resolutions; it is updated while
+samples are added. Querying a range of the series returns at most the requested number of points, from the
+resolution closest to that number, so the cost of plotting does not depend on the length of the series.
+
+`lttb` implements Largest-Triangle-Three-Buckets downsampling, which preserves the visual shape of a series better
+than picking every n-th sample.
+"""
+
+import numpy
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+
+class GrowingArray(object):
+    """A 1-dimensional array that can grow in amortized O(1)"""
+
+    def __init__(self, dtype=float, size=64):
+        super(GrowingArray, self).__init__()
+        self._array = numpy.empty(size, dtype=dtype)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def data(self):
+        """View on the used part of the array"""
+        return self._array[:self._length]
+
+    def resize(self, length):
+        """Grow (or shrink) the used part of the array"""
+        if length > len(self._array):
+            array = numpy.empty(max(length, 2 * len(self._array)), dtype=self._array.dtype)
+            array[:self._length] = self._array[:self._length]
+            self._array = array
+        self._length = length
+        return self.data
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution index of the minimum and maximum values of a series
+
+    Level k holds the minimum and maximum of blocks of `factor ** k` samples. The raw samples (level 0) are not
+    stored by the pyramid, give a `source` to query them: a callable returning the samples between two positions,
+    `source(start, stop)`, like `julesTk.model.timeseries.TimeSeriesModel.window`. Sources may return fewer samples
+    when the first samples are no longer available.
+
+    Positions count from the first sample added after creating or resetting the pyramid.
+    """
+
+    def __init__(self, factor=4, source=None, dtype=float):
+        """Initialize an empty pyramid
+
+        :param factor: Number of blocks of a level combined in one block of the next level
+        :type factor: int
+        :param source: Callable returning the raw samples between two positions
+        :type source: None | callable
+        """
+        super(MinMaxPyramid, self).__init__()
+        if factor < 2:
+            raise ValueError("Invalid factor: {}".format(factor))
+        self._factor = int(factor)
+        self._source = source
+        self._dtype = dtype
+        self._levels = []
+        self._count = 0
+
+    @property
+    def factor(self):
+        return self._factor
+
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, source):
+        self._source = source
+
+    @property
+    def levels(self):
+        """Number of levels (excluding the raw samples)"""
+        return len(self._levels)
+
+    def __len__(self):
+        """Number of samples added"""
+        return self._count
+
+    def block_size(self, level):
+        """Number of samples per block in the given level"""
+        return self.factor ** level
+
+    def get_level(self, level):
+        """Minimum and maximum values of the blocks in a level (1 or higher)
+
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        mins, maxs = self._levels[level - 1]
+        return mins.data, maxs.data
+
+    def reset(self):
+        """Remove all samples"""
+        self._levels = []
+        self._count = 0
+
+    def extend(self, values):
+        """Add samples to the pyramid"""
+        values = numpy.asarray(values, dtype=self._dtype).ravel()
+        if len(values) == 0:
+            return
+        start = self._count
+        self._count += len(values)
+        if len(self._levels) == 0:
+            self._levels.append((GrowingArray(self._dtype), GrowingArray(self._dtype)))
+        # level 1: from raw values
+        changed = self._update_level_1(start, values)
+        # higher levels: from lower levels
+        level = 1
+        while len(self._levels[level - 1][0]) > self.factor:
+            if len(self._levels) == level:
+                self._levels.append((GrowingArray(self._dtype), GrowingArray(self._dtype)))
+                changed = 0
+            changed = self._update_level(level + 1, changed)
+            level += 1
+
+    def _update_level_1(self, start, values):
+        """Update the first level with new samples starting at position start
+
+        :return: Index of the first block that was changed
+        """
+        mins, maxs = self._levels[0]
+        size = self.factor
+        first = start // size
+        blocks = -(-self._count // size)
+        index = len(mins)
+        mins.resize(blocks)
+        maxs.resize(blocks)
+        # samples completing a partially filled block
+        partial = (size - start % size) % size
+        head = values[:partial]
+        if len(head) > 0:
+            mins.data[first] = min(mins.data[first], head.min())
+            maxs.data[first] = max(maxs.data[first], head.max())
+        rest = values[partial:]
+        if len(rest) > 0:
+            indices = numpy.arange(0, len(rest), size)
+            mins.data[index:] = numpy.minimum.reduceat(rest, indices)
+            maxs.data[index:] = numpy.maximum.reduceat(rest, indices)
+        return first
+
+    def _update_level(self, level, changed):
+        """Recompute the blocks of level from the blocks in the level below, starting at block `changed`
+
+        :return: Index of the first block that was changed in this level
+        """
+        lower_mins, lower_maxs = self.get_level(level - 1)
+        mins, maxs = self._levels[level - 1]
+        first = changed // self.factor
+        blocks = -(-len(lower_mins) // self.factor)
+        mins.resize(blocks)
+        maxs.resize(blocks)
+        indices = numpy.arange(first * self.factor, len(lower_mins), self.factor)
+        mins.data[first:] = numpy.minimum.reduceat(lower_mins, indices)
+        maxs.data[first:] = numpy.maximum.reduceat(lower_maxs, indices)
+        return first
+
+    def select_level(self, start, stop, max_points):
+        """The finest level that shows the samples between start and stop in at most max_points points
+
+        :return: The level, 0 for the raw samples
+        :rtype: int
+        """
+        count = max(stop - start, 0)
+        level = 0
+        if count > max_points or self.source is None:
+            level = 1
+            while level < self.levels and 2 * (-(-count // self.block_size(level)) + 1) > max_points:
+                level += 1
+        return min(level, self.levels)
+
+    def query(self, start=None, stop=None, max_points=1000):
+        """Points to draw the samples between start and stop
+
+        Returns the raw samples if there are at most max_points samples (and a source is available), otherwise the
+        minimum and maximum of each block is returned (two points per block, at the center of the block).
+
+        :param start: Position of the first sample, defaults to the first sample
+        :type start: None | int
+        :param stop: Position after the last sample, defaults to all samples
+        :type stop: None | int
+        :param max_points: Maximum number of points to return
+        :type max_points: int
+        :return: Positions and values
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        start = 0 if start is None else max(int(start), 0)
+        stop = self._count if stop is None else min(int(stop), self._count)
+        stop = max(start, stop)
+        level = self.select_level(start, stop, max_points)
+        if level == 0 and self.source is None:
+            x, y = numpy.empty(0), numpy.empty(0, dtype=self._dtype)
+        elif level == 0:
+            y = numpy.asarray(self.source(start, stop))
+            x = numpy.arange(stop - len(y), stop)
+        else:
+            size = self.block_size(level)
+            mins, maxs = self.get_level(level)
+            first, last = start // size, -(-stop // size)
+            centers = numpy.arange(first, last) * size + (size - 1) / 2.0
+            x = numpy.repeat(centers, 2)
+            y = numpy.empty(len(x), dtype=mins.dtype)
+            y[0::2] = mins[first:last]
+            y[1::2] = maxs[first:last]
+        return x, y
+
+    def query_lttb(self, start=None, stop=None, max_points=1000):
+        """Like query, but downsamples the raw samples using `lttb` (requires a source)
+
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        if self.source is None:
+            return self.query(start, stop, max_points)
+        start = 0 if start is None else max(int(start), 0)
+        stop = self._count if stop is None else min(int(stop), self._count)
+        y = numpy.asarray(self.source(start, max(start, stop)))
+        x = numpy.arange(max(start, stop) - len(y), max(start, stop))
+        return lttb(x, y, max_points)
+
+
+def lttb(x, y, threshold):
+    """Downsample a series to threshold points using Largest-Triangle-Three-Buckets
+
+    :param x: Positions of the samples (increasing)
+    :param y: Values of the samples
+    :param threshold: Number of points to return
+    :type threshold: int
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return x, y
+    indices = numpy.zeros(threshold, dtype=numpy.intp)
+    indices[-1] = count - 1
+    # the first and last point are always kept, the others are divided over threshold - 2 buckets
+    edges = (numpy.arange(threshold - 1) * (count - 2) / float(threshold - 2)).astype(numpy.intp) + 1
+    edges[-1] = count - 1
+    selected = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket (or the last point)
+        next_hi = edges[i + 2] if i + 2 < len(edges) else count
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        px, py = x[selected], y[selected]
+        areas = numpy.abs((px - avg_x) * (y[lo:hi] - py) - (px - x[lo:hi]) * (avg_y - py))
+        selected = lo + int(numpy.argmax(areas))
+        indices[i + 1] = selected
+    return x[indices], y[indices]
@@ -1,6 +1,13 @@
 """Provides classes that help with creating Observer-Observable structures"""
 
 import functools
+import sys
+import threading
+import traceback
+import types
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 
 __author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
 
@@ -14,14 +21,45 @@ class Observable(object):
     2. Use `@observed` decorator for methods that should call `notify_observers` when finished
 
     Observers can register themselves using the `register_observer` method.
-    Only 1 observer registration per object.
+    Only 1 observer registration per object. Besides `Observer` objects, any callable accepting the observable
+    can be registered (e.g. a bound method: `model.register_observer(self.on_change)`).
+
+    The observable only keeps weak references to its observers, it does not keep them alive. Observers that
+    are garbage collected are removed from the registry automatically. Note that this means that a lambda or
+    local function has to be kept alive by its owner to keep receiving notifications.
+
+    Changes
+    -------
+
+    A notification carries a list of `Change` events describing what was changed, so observers can apply only
+    the difference. Pass a change to `notify_observers(change)`; without a change a generic `Change.changed()`
+    is sent, meaning that observers should assume everything was changed. Observers receive the changes in
+    `Observer.process_changes`.
+
+    Threads
+    -------
+
+    Observers (usually controllers) tend to update widgets, which is only safe in the thread running the Tk mainloop.
+    When a `Dispatcher` is installed (`Application` does this when started), notifications sent from other threads are
+    queued and delivered by the dispatcher in the main thread.
+
+    Batching
+    --------
+
+    Notifications can be suspended by running code in a batch; either using the `batch()` context manager or
+    by decorating a method with `@batched`. Batches can be nested, while batching `notify_observers` only
+    records the change. When the outermost batch exits, observers are notified once with the coalesced changes.
+
+    Batches belong to the thread running them: a batch only suspends the notifications sent by its own thread, so
+    threads updating the same observable do not interfere.
 
     """
 
     def __init__(self):
         # super prevents disruption of mro chain
         super(Observable, self).__init__()
-        self._observers = []
+        self._observers = OrderedDict()
+        self._batch_state = threading.local()
 
     def register_observer(self, observer):
         """Register an observer to get notified when this object is changed.
@@ -29,37 +67,501 @@ class Observable(object):
         Will only add the observer if it is not already observing.
 
         :param observer: The observer that should be notified
-        :type observer: julesTk.Observer
+        :type observer: julesTk.Observer | callable
         """
-        if not isinstance(observer, Observer):
+        if not isinstance(observer, Observer) and not callable(observer):
             raise ValueError("Expected a Observer, not {}".format(type(observer)))
-        if observer not in self._observers:
-            self._observers.append(observer)
+        key = _observer_key(observer)
+        ref = self._observers.get(key)
+        if ref is None or ref() is None:
+            self._observers[key] = _observer_ref(observer)
+
+    def unregister_observer(self, observer):
+        """Stop notifying the observer about changes to this object
+
+        Does nothing if the observer is not registered.
+
+        :param observer: The observer that should no longer be notified
+        :type observer: julesTk.Observer | callable
+        """
+        key = _observer_key(observer)
+        ref = self._observers.get(key)
+        if ref is not None and ref() in (None, observer):
+            self._observers.pop(key)
+
+    @property
+    def observers(self):
+        """All observers (still) observing this object
+
+        :rtype: list[julesTk.Observer | callable]
+        """
+        result = []
+        for ref in list(self._observers.values()):
+            observer = ref()
+            if observer is not None:
+                result.append(observer)
+        return result
+
+    def _batch(self):
+        """The batch state of the current thread: depth, recorded changes and number of notifications"""
+        state = self._batch_state
+        if not hasattr(state, "depth"):
+            state.depth = 0
+            state.changes = []
+            state.count = 0
+        return state
 
-    def notify_observers(self):
-        """Notifies all observing observers"""
-        for observer in self._observers:
-            observer.update(self)
+    def is_batching(self):
+        """Whether notifications of the current thread are suspended by a batch"""
+        return self._batch().depth > 0
+
+    @contextmanager
+    def batch(self):
+        """Context manager suspending notifications until the outermost batch exits
+
+        >>> with model.batch():
+        ...     model.update()
+        ...     model.update()  # observers are notified once, after the with-block
+        """
+        state = self._batch()
+        state.depth += 1
+        try:
+            yield self
+        finally:
+            state.depth -= 1
+            if state.depth == 0 and len(state.changes) > 0:
+                changes, state.changes = state.changes, []
+                self._notify_observers(changes)
+
+    def notify_observers(self, change=None):
+        """Notifies all observing observers
+
+        When called inside a batch, the notification is postponed until the batch is finished.
+
+        :param change: Description of the change, defaults to a generic change
+        :type change: julesTk.utils.observe.Change
+        """
+        if change is None:
+            change = Change.changed()
+        state = self._batch()
+        state.count += 1
+        if state.depth > 0:
+            state.changes = _append_change(state.changes, change)
+        else:
+            self._notify_observers([change])
+
+    def _notify_observers(self, changes):
+        """Send the notification to all observers, removing observers that no longer exist
+
+        :type changes: list[julesTk.utils.observe.Change]
+        """
+        dispatcher = get_dispatcher()
+        if dispatcher is not None and not dispatcher.is_main_thread():
+            dispatcher.post(self, changes)
+        else:
+            self._deliver(changes)
+
+    def _deliver(self, changes):
+        """Deliver the changes to the observers in the current thread
+
+        :type changes: list[julesTk.utils.observe.Change]
+        """
+        for key, ref in list(self._observers.items()):
+            observer = ref()
+            if observer is None:
+                self._observers.pop(key, None)
+            elif isinstance(observer, Observer):
+                observer.process_changes(self, changes)
+            else:
+                observer(self)
 
     def observed(f):
         """Decorator that will automatically call notify_observers after executing this method
 
+        The method is executed in a batch, so notifications sent by the method itself are coalesced. If the
+        method did not send any notification itself, a generic change is sent.
+
         :type f: callable
         """
         @functools.wraps(f)
         def magic(self, *args, **kwargs):
-            result = f(self, *args, **kwargs)
-            self.notify_observers()
+            with self.batch():
+                count = self._batch().count
+                result = f(self, *args, **kwargs)
+                if self._batch().count == count:
+                    self.notify_observers()
             return result
         return magic
 
     observed = staticmethod(observed)
 
+    def batched(f):
+        """Decorator that will execute this method in a batch
+
+        All notifications sent while executing the method are coalesced into one notification,
+        sent when the outermost batch exits.
+
+        :type f: callable
+        """
+        @functools.wraps(f)
+        def magic(self, *args, **kwargs):
+            with self.batch():
+                result = f(self, *args, **kwargs)
+            return result
+        return magic
+
+    batched = staticmethod(batched)
+
+
+class Change(object):
+    """Describes a change made to an Observable
+
+    - changed: Unspecified change, observers should assume everything changed
+    - append: `count` items were appended at position `start`
+    - reset: All data was removed (or replaced)
+    - replace: The items in `index` (a slice) were replaced
+    - attribute: The attribute `name` was changed
+    """
+
+    CHANGED = "changed"
+    APPEND = "append"
+    RESET = "reset"
+    REPLACE = "replace"
+    ATTRIBUTE = "attribute"
+
+    def __init__(self, kind, start=None, count=None, index=None, name=None):
+        super(Change, self).__init__()
+        self._kind = kind
+        self._start = start
+        self._count = count
+        self._index = index
+        self._name = name
+
+    @classmethod
+    def changed(cls):
+        return cls(cls.CHANGED)
+
+    @classmethod
+    def append(cls, start, count):
+        return cls(cls.APPEND, start=start, count=count)
+
+    @classmethod
+    def reset(cls):
+        return cls(cls.RESET)
+
+    @classmethod
+    def replace(cls, index):
+        if not isinstance(index, slice):
+            index = slice(index, index + 1)
+        return cls(cls.REPLACE, index=index)
+
+    @classmethod
+    def attribute(cls, name):
+        return cls(cls.ATTRIBUTE, name=name)
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def start(self):
+        """Position of the first appended item"""
+        return self._start
+
+    @property
+    def count(self):
+        """Number of appended items"""
+        return self._count
+
+    @property
+    def stop(self):
+        """Position after the last appended item"""
+        result = None
+        if self.kind == self.APPEND:
+            result = self.start + self.count
+        return result
+
+    @property
+    def index(self):
+        """Slice of replaced items"""
+        return self._index
+
+    @property
+    def name(self):
+        """Name of the changed attribute"""
+        return self._name
+
+    def merge(self, other):
+        """Combine this change with a change that happened after this change
+
+        :type other: julesTk.utils.observe.Change
+        :return: A change describing both changes or None if they can not be combined
+        :rtype: None | julesTk.utils.observe.Change
+        """
+        result = None
+        if other.kind == self.RESET:
+            result = other
+        elif self.kind == other.kind == self.CHANGED:
+            result = self
+        elif self.kind == other.kind == self.APPEND and self.stop == other.start:
+            result = Change.append(self.start, self.count + other.count)
+        elif self.kind == other.kind == self.ATTRIBUTE and self.name == other.name:
+            result = self
+        elif self.kind == other.kind == self.REPLACE and self.index == other.index:
+            result = self
+        return result
+
+    def __eq__(self, other):
+        return isinstance(other, Change) and (
+            (self.kind, self.start, self.count, self.index, self.name) ==
+            (other.kind, other.start, other.count, other.index, other.name)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        details = []
+        if self.kind == self.APPEND:
+            details = ["start={}".format(self.start), "count={}".format(self.count)]
+        elif self.kind == self.REPLACE:
+            details = ["index={}".format(self.index)]
+        elif self.kind == self.ATTRIBUTE:
+            details = ["name={!r}".format(self.name)]
+        return "<Change {}{}>".format(self.kind, "".join(" " + d for d in details))
+
+
+def coalesce_changes(changes):
+    """Reduce a list of changes to the shortest list of changes with the same effect
+
+    Consecutive changes are merged where possible and everything that happened before a reset is dropped.
+
+    :type changes: list[julesTk.utils.observe.Change]
+    :rtype: list[julesTk.utils.observe.Change]
+    """
+    result = []
+    for change in changes:
+        result = _append_change(result, change)
+    return result
+
+
+def _append_change(changes, change):
+    """Add a change to a list of already coalesced changes"""
+    if change.kind == Change.RESET:
+        changes = []
+    merged = None
+    if len(changes) > 0:
+        merged = changes[-1].merge(change)
+    if merged is not None:
+        changes[-1] = merged
+    else:
+        changes.append(change)
+    return changes
+
+
+class Dispatcher(object):
+    """Delivers notifications sent from other threads in the thread running the Tk mainloop
+
+    Notifications are put in a queue (a `deque`, so threads do not have to wait for a lock) and a pump, scheduled
+    using `after`, delivers the queued notifications every `interval` seconds. Notifications of the same observable
+    are coalesced, so each observer receives at most one notification per observable per run of the pump. At most
+    `batch_size` notifications are taken from the queue per run, to keep the GUI responsive.
+
+    Besides notifications, other threads can use `call` to have a function called in the main thread.
+
+    An error raised while delivering a notification or performing a call is reported (using the
+    `report_callback_exception` of the root, like errors in Tk callbacks) and does not affect the other deliveries.
+    """
+
+    def __init__(self, root, interval=0.02, batch_size=1000):
+        """Initialize a dispatcher; has to be created in the thread running the Tk mainloop
+
+        :param root: Widget used to schedule the pump
+        :type root: Tkinter.Misc | tkinter.Misc
+        :param interval: Time between two runs of the pump (in seconds)
+        :type interval: int | float
+        :param batch_size: Maximum number of notifications to take from the queue per run
+        :type batch_size: int
+        """
+        super(Dispatcher, self).__init__()
+        self._root = root
+        self._thread = threading.current_thread()
+        self._queue = deque()
+        self._interval = interval
+        self._batch_size = batch_size
+        self._job = None
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @interval.setter
+    def interval(self, v):
+        self._interval = v
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @batch_size.setter
+    def batch_size(self, v):
+        self._batch_size = v
+
+    def is_main_thread(self):
+        """Whether the current thread is the thread in which notifications are delivered"""
+        return threading.current_thread() is self._thread
+
+    def is_running(self):
+        return self._job is not None
+
+    def pending(self):
+        """Number of notifications waiting to be delivered"""
+        return len(self._queue)
+
+    def post(self, observable, changes):
+        """Queue a notification for delivery in the main thread; can be called from any thread
+
+        :type observable: julesTk.utils.observe.Observable
+        :type changes: list[julesTk.utils.observe.Change]
+        """
+        self._queue.append((observable, changes, None, None))
+
+    def call(self, f, *args):
+        """Queue a function call for execution in the main thread; can be called from any thread
+
+        :param f: The function to call with the given arguments
+        :type f: callable
+        """
+        self._queue.append((None, None, f, args))
+
+    def start(self):
+        """Start the pump"""
+        if not self.is_running():
+            self._pump()
+
+    def stop(self):
+        """Stop the pump, notifications that are still queued are not delivered"""
+        if self._job is not None:
+            self._root.after_cancel(self._job)
+            self._job = None
+
+    def process(self):
+        """Deliver (at most `batch_size`) queued notifications
+
+        :return: Number of notifications taken from the queue
+        :rtype: int
+        """
+        notifications = OrderedDict()
+        calls = []
+        count = 0
+        while count < self.batch_size:
+            try:
+                observable, changes, f, args = self._queue.popleft()
+            except IndexError:
+                break
+            count += 1
+            if f is not None:
+                calls.append((f, args))
+                continue
+            key = id(observable)
+            if key not in notifications:
+                notifications[key] = (observable, [])
+            notifications[key][1].extend(changes)
+        for observable, changes in notifications.values():
+            try:
+                observable._deliver(coalesce_changes(changes))
+            except Exception:
+                self._report_error()
+        for f, args in calls:
+            try:
+                f(*args)
+            except Exception:
+                self._report_error()
+        return count
+
+    def _report_error(self):
+        """Report the error that is being handled"""
+        report = getattr(self._root, "report_callback_exception", None)
+        if report is not None:
+            report(*sys.exc_info())
+        else:
+            traceback.print_exc()
+
+    def _pump(self):
+        try:
+            self.process()
+        finally:
+            self._job = self._root.after(int(self.interval * 1000), self._pump)
+
+
+_dispatcher = None
+
+
+def get_dispatcher():
+    """The dispatcher used to deliver notifications sent from other threads
+
+    :rtype: None | julesTk.utils.observe.Dispatcher
+    """
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher):
+    """Install the dispatcher used to deliver notifications sent from other threads
+
+    :param dispatcher: The dispatcher or None to deliver notifications in the sending thread
+    :type dispatcher: None | julesTk.utils.observe.Dispatcher
+    """
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+class WeakMethod(object):
+    """A weak reference to a bound method
+
+    A plain weak reference to a bound method dies immediately, as the bound method object is created on
+    attribute access. Instead only the instance is referenced weakly, the method is re-bound when called.
+    """
+
+    def __init__(self, method):
+        super(WeakMethod, self).__init__()
+        self._instance = weakref.ref(method.__self__)
+        self._function = method.__func__
+
+    def __call__(self):
+        """Return the bound method or None if the instance no longer exists"""
+        instance = self._instance()
+        result = None
+        if instance is not None:
+            result = types.MethodType(self._function, instance)
+        return result
+
+
+def _is_bound_method(observer):
+    return getattr(observer, "__self__", None) is not None and hasattr(observer, "__func__")
+
+
+def _observer_key(observer):
+    """Key under which the observer is stored in the registry of an Observable"""
+    if _is_bound_method(observer):
+        return id(observer.__self__), id(observer.__func__)
+    return id(observer)
+
+
+def _observer_ref(observer):
+    """Create a weak reference to the observer"""
+    if _is_bound_method(observer):
+        return WeakMethod(observer)
+    try:
+        return weakref.ref(observer)
+    except TypeError:
+        raise ValueError("Unable to observe using {}, it can not be weakly referenced".format(type(observer)))
+
 
 class Observer(object):
     """An observer for observing a observable
 
-    Implement `update` to handle notifications
+    Implement `update` to handle notifications, or `process_changes` to handle the changes described in the
+    notification.
     """
 
     def __init__(self):
@@ -72,3 +574,15 @@ class Observer(object):
         :type observable: julesTk.Observable
         """
         raise NotImplementedError
+
+    def process_changes(self, observable, changes):
+        """Handle the changes sent by an object that is being observed by this object.
+
+        By default a notification is handled by `update`.
+
+        :param observable: Object that sent the notification
+        :type observable: julesTk.Observable
+        :param changes: The changes made to the observable since the last notification
+        :type changes: list[julesTk.utils.observe.Change]
+        """
+        self.update(observable)
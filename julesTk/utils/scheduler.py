@@ -0,0 +1,165 @@
+"""Runs many timed callbacks from a single Tk timer"""
+
+import heapq
+import itertools
+import sys
+import time
+import traceback
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    # python 2
+    monotonic = time.time
+
+
+class Task(object):
+    """A callback scheduled to run at a deadline"""
+
+    __slots__ = ("deadline", "priority", "sequence", "callback", "active")
+
+    def __init__(self, deadline, priority, sequence, callback):
+        self.deadline = deadline
+        self.priority = priority
+        self.sequence = sequence
+        self.callback = callback
+        self.active = True
+
+    def __lt__(self, other):
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+
+class Scheduler(object):
+    """Runs scheduled callbacks using one Tk timer
+
+    Callbacks are kept in a heap, ordered by deadline (a `monotonic` time). Only one `after` call is pending, for the
+    earliest deadline. When the timer fires, all callbacks due within the next `frame` seconds are run together, in
+    order of priority (highest first). Callbacks with nearby deadlines therefore share a frame, instead of each
+    waking up the mainloop (and redrawing) separately. An exception raised by a callback is reported (see
+    `report_callback_exception`) and does not stop the other callbacks due in the frame.
+    """
+
+    def __init__(self, root, frame=1 / 60.0):
+        """Initialize the scheduler
+
+        :param root: Widget used to schedule the timer
+        :type root: Tkinter.Misc | tkinter.Misc
+        :param frame: Callbacks due within this number of seconds are run together
+        :type frame: float
+        """
+        super(Scheduler, self).__init__()
+        self._root = root
+        self._frame = frame
+        self._heap = []
+        self._sequence = itertools.count()
+        self._job = None
+        self._job_deadline = None
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @frame.setter
+    def frame(self, v):
+        self._frame = v
+
+    def __len__(self):
+        """Number of scheduled callbacks"""
+        return sum(1 for task in self._heap if task.active)
+
+    def schedule(self, callback, deadline, priority=0):
+        """Run callback at the deadline
+
+        :param callback: Function to call, without arguments
+        :type callback: callable
+        :param deadline: Monotonic time (see `julesTk.utils.scheduler.monotonic`) to run the callback
+        :type deadline: float
+        :param priority: Callbacks with a higher priority run first when due in the same frame
+        :type priority: int
+        :return: The task, use it to cancel the callback
+        :rtype: julesTk.utils.scheduler.Task
+        """
+        task = Task(deadline, priority, next(self._sequence), callback)
+        heapq.heappush(self._heap, task)
+        self._update_timer()
+        return task
+
+    def schedule_after(self, callback, delay, priority=0):
+        """Run callback after delay seconds
+
+        :rtype: julesTk.utils.scheduler.Task
+        """
+        return self.schedule(callback, monotonic() + delay, priority=priority)
+
+    def cancel(self, task):
+        """Cancel a scheduled callback
+
+        :type task: julesTk.utils.scheduler.Task
+        """
+        task.active = False
+        self._discard()
+
+    def stop(self):
+        """Cancel all scheduled callbacks"""
+        for task in self._heap:
+            task.active = False
+        self._heap = []
+        self._cancel_timer()
+
+    def _discard(self):
+        """Remove cancelled tasks from the top of the heap"""
+        while len(self._heap) > 0 and not self._heap[0].active:
+            heapq.heappop(self._heap)
+
+    def _cancel_timer(self):
+        if self._job is not None:
+            self._root.after_cancel(self._job)
+            self._job = None
+            self._job_deadline = None
+
+    def _update_timer(self):
+        """Make sure the timer fires at the earliest deadline"""
+        self._discard()
+        if len(self._heap) == 0:
+            self._cancel_timer()
+            return
+        deadline = self._heap[0].deadline
+        if self._job is None or deadline < self._job_deadline:
+            self._cancel_timer()
+            delay = max(0.0, deadline - monotonic())
+            self._job = self._root.after(int(round(delay * 1000)), self._run)
+            self._job_deadline = deadline
+
+    def _run(self):
+        """Run all callbacks due in this frame"""
+        self._job = None
+        self._job_deadline = None
+        limit = monotonic() + self.frame
+        due = []
+        self._discard()
+        while len(self._heap) > 0 and self._heap[0].deadline <= limit:
+            task = heapq.heappop(self._heap)
+            if task.active:
+                due.append(task)
+            self._discard()
+        due.sort(key=lambda t: (-t.priority, t.deadline, t.sequence))
+        try:
+            for task in due:
+                if task.active:
+                    task.active = False
+                    try:
+                        task.callback()
+                    except Exception:
+                        self._report_error()
+        finally:
+            self._update_timer()
+
+    def _report_error(self):
+        """Report the error that is being handled"""
+        report = getattr(self._root, "report_callback_exception", None)
+        if report is not None:
+            report(*sys.exc_info())
+        else:
+            traceback.print_exc()
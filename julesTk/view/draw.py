@@ -0,0 +1,101 @@
+"""Shared drawing functions of the plotting frames"""
+
+from julesTk.utils.scheduler import monotonic
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+
+class DrawThrottle(object):
+    """Draw throttling mixin for frames, coalescing draw requests into at most `max_fps` renders per second
+
+    `draw` only requests a render, renders are scheduled using `after`. Subclasses implement `_render`.
+    """
+
+    MAX_FPS = 30
+
+    def __init__(self, *args, **kwargs):
+        super(DrawThrottle, self).__init__(*args, **kwargs)
+        self._max_fps = self.MAX_FPS
+        self._draw_job = None
+        self._last_draw = None
+        self._draw_requests = 0
+        self._draw_count = 0
+
+    @property
+    def max_fps(self):
+        """Maximum number of renders per second, None to render every request immediately"""
+        return self._max_fps
+
+    @max_fps.setter
+    def max_fps(self, v):
+        if v is not None and v <= 0:
+            raise ValueError("Invalid maximum frame rate: {}".format(v))
+        self._max_fps = v
+
+    @property
+    def draw_requests(self):
+        """Number of times a draw was requested"""
+        return self._draw_requests
+
+    @property
+    def draw_count(self):
+        """Number of times a render was performed"""
+        return self._draw_count
+
+    def is_draw_pending(self):
+        """Whether a render is scheduled"""
+        return self._draw_job is not None
+
+    def draw(self):
+        """Request a render, renders are limited to max_fps"""
+        self._draw_requests += 1
+        if self.max_fps is None:
+            self._perform_render()
+        elif not self.is_draw_pending():
+            delay = 0.0
+            if self._last_draw is not None:
+                delay = max(0.0, self._last_draw + 1.0 / self.max_fps - monotonic())
+            self._draw_job = self.after(int(round(delay * 1000)), self._perform_draw)
+
+    def draw_now(self):
+        """Render immediately"""
+        self._cancel_draw()
+        self._perform_render()
+
+    def _perform_draw(self):
+        self._draw_job = None
+        self._perform_render()
+
+    def _perform_render(self):
+        self._draw_count += 1
+        self._last_draw = monotonic()
+        self._render()
+
+    def _render(self):
+        raise NotImplementedError
+
+    def _cancel_draw(self):
+        if self._draw_job is not None:
+            self.after_cancel(self._draw_job)
+            self._draw_job = None
+
+    def destroy(self):
+        self._cancel_draw()
+        super(DrawThrottle, self).destroy()
+
+
+def as_points(x, y, convert=list):
+    """The x- and y-values of points, converted to sequences
+
+    :param x: x-values, or the x-value of a single point
+    :param y: y-values, or the y-value of a single point
+    :param convert: Creates a sequence from the values, e.g. `numpy.asarray`
+    :type convert: callable
+    :rtype: tuple
+    """
+    if not hasattr(x, "__len__"):
+        x, y = [x], [y]
+    x, y = convert(x), convert(y)
+    if len(x) != len(y):
+        raise ValueError("x and y should have the same length, not {} and {}".format(len(x), len(y)))
+    return x, y
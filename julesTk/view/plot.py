@@ -1,14 +1,211 @@
 """Implement a Frame with a matplotlib"""
 
 from julesTk.view import *
+from julesTk.view.draw import DrawThrottle, as_points
+from julesTk.utils.decimate import GrowingArray
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+import numpy
 import matplotlib
 matplotlib.use("TkAgg")
+from matplotlib.backend_bases import DrawEvent
+from matplotlib.backends.backend_agg import RendererAgg
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
 from matplotlib.figure import Figure
 
 
-class PlotFrame(Frame, object):
+class Series(object):
+    """A named line in a PlotFrame, with its data"""
+
+    def __init__(self, name, line):
+        super(Series, self).__init__()
+        self._name = name
+        self._line = line
+        self._x = GrowingArray(float)
+        self._y = GrowingArray(float)
+        self._source = None
+        self._stale = False
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def source(self):
+        """Decimation index providing the points of this series, None when the points are set directly
+
+        :rtype: None | julesTk.utils.decimate.MinMaxPyramid
+        """
+        return self._source
+
+    @source.setter
+    def source(self, source):
+        self._source = source
+
+    @property
+    def line(self):
+        """The artist drawing this series
+
+        :rtype: matplotlib.lines.Line2D
+        """
+        return self._line
+
+    @property
+    def x(self):
+        return self._x.data
+
+    @property
+    def y(self):
+        return self._y.data
+
+    def __len__(self):
+        return len(self._x)
+
+    def is_stale(self):
+        """Whether the data changed since the line was last updated"""
+        return self._stale
+
+    def set_data(self, x, y):
+        """Replace the data, call `update_line` to show it"""
+        x, y = _as_arrays(x, y)
+        self._x.resize(len(x))[:] = x
+        self._y.resize(len(y))[:] = y
+        self._stale = True
+        return x, y
+
+    def append(self, x, y):
+        """Add to the data, call `update_line` to show it"""
+        x, y = _as_arrays(x, y)
+        length = len(self._x)
+        self._x.resize(length + len(x))[length:] = x
+        self._y.resize(length + len(y))[length:] = y
+        self._stale = True
+        return x, y
+
+    def update_line(self, copy=False):
+        """Hand the data to the line (a copy of the data, if the line is rendered while the data changes)"""
+        x, y = self.x, self.y
+        if copy:
+            x, y = x.copy(), y.copy()
+        self.line.set_data(x, y)
+        self._stale = False
+
+
+class PlotCanvas(FigureCanvasTkAgg):
+    """The canvas of a PlotFrame, rendering (e.g. after resizing or zooming) using the frame
+
+    When the frame renders in a worker thread, renders of the canvas are requested from the frame as well, so the
+    figure is never rendered by two threads at once.
+    """
+
+    def __init__(self, figure, frame):
+        super(PlotCanvas, self).__init__(figure, frame)
+        self._frame = frame
+
+    def draw(self):
+        if self._frame.is_threaded():
+            self._frame.draw()
+        else:
+            with self._frame.render_lock:
+                super(PlotCanvas, self).draw()
+
+    def resize(self, event):
+        self._frame.change_figure(super(PlotCanvas, self).resize, event)
+
+
+class PlotToolbar(NavigationToolbar2TkAgg):
+    """The toolbar of a PlotFrame, changing the axes limits (zooming and panning) using the frame
+
+    When the frame renders in a worker thread, changes are postponed until a running render finished.
+    """
+
+    def __init__(self, canvas, frame):
+        super(PlotToolbar, self).__init__(canvas, frame)
+        self._frame = frame
+
+    def drag_pan(self, event):
+        self._frame.change_figure(super(PlotToolbar, self).drag_pan, event)
+
+    def release_zoom(self, event):
+        self._frame.change_figure(super(PlotToolbar, self).release_zoom, event)
+
+    def _update_view(self):
+        # used by home, back and forward
+        self._frame.change_figure(super(PlotToolbar, self)._update_view)
+
+
+def _blit_photo(photo, renderer):
+    """Copy the RGBA buffer of an Agg renderer into a Tk photo image"""
+    try:
+        from matplotlib.backends import _backend_tk
+        _backend_tk.blit(photo, renderer.buffer_rgba(), (0, 1, 2, 3))
+    except ImportError:
+        # matplotlib < 2.2
+        from matplotlib.backends import tkagg
+        tkagg.blit(photo, renderer._renderer, colormode=2)
+
+
+def _as_arrays(x, y):
+    return as_points(x, y, convert=lambda values: numpy.asarray(values, dtype=float).ravel())
+
+
+class PlotFrame(DrawThrottle, Frame):
+    """A frame with a matplotlib figure
+
+    Streaming data
+    --------------
+
+    Instead of clearing and re-plotting, keep lines in the figure and update their data: `add_line` creates a named
+    line, `append` adds points to it and `set_data` replaces its points. The axes limits are only changed when the
+    data grows outside of them (`y_margin` is added around the data); points with nan values (e.g. gaps in an
+    acquisition) are ignored. Call `draw` to show the changes.
+
+    Blitting
+    --------
+
+    With `set_blit(True)` the lines are animated: a full render caches the static background (axes, ticks, labels,
+    legend) and `draw` only restores the background, draws the lines and blits the result. The background is
+    captured again after every full render (e.g. after resizing or zooming/panning with the toolbar) and invalidated
+    when the axes limits change.
+
+    Zooming and panning
+    -------------------
+
+    Instead of setting all points of a long series, register a decimation index (e.g. a
+    `julesTk.utils.decimate.MinMaxPyramid`) as source of a line with `set_source`. The line then only holds the
+    points of the visible x-range at screen resolution (`max_points`): whenever the x-limits are changed by the
+    user (zooming or panning with the toolbar) the source is queried again, so zooming in reveals all details. Call
+    `refresh` after adding samples to the source.
+
+    Drawing
+    -------
+
+    `draw` only requests a render: requests are coalesced and rendered (scheduled using `after`) at most `max_fps`
+    times per second, no matter how many observers or pollers request a draw. Use `draw_now` to render immediately.
+    `draw_requests` and `draw_count` count the requested and performed renders.
+
+    Threaded rendering
+    ------------------
+
+    With `set_threaded(True)` renders (requested by `draw`, or by the canvas after resizing or zooming) are
+    performed on a worker thread, into an off-screen Agg buffer. When the render is finished, the buffer is copied
+    into the Tk image on the main thread; until then the previous frame stays on screen, and the mainloop keeps
+    handling events. At most one render is in progress, draws requested meanwhile are coalesced into one render
+    after it. The `draw_event` of a render is sent in the main thread, once the render is shown.
+
+    The figure may not change while it is rendered. `append`, `set_data`, `refresh` and `rescale` never wait for
+    a render: they only update the data of the frame, the lines and axes limits are updated on the main thread
+    between renders. Resizing the canvas and zooming or panning with the toolbar are postponed the same way
+    (see `change_figure`). Methods changing the figure itself (e.g. `add_line`, `clear`) hold `render_lock`,
+    waiting for a running render to finish; hold it as well when changing the figure or axes directly
+    (e.g. `with plot.render_lock: plot.axes.set_title("Title")`), or pass the change to `change_figure`.
+    Threaded rendering and blitting cannot be combined, enabling one disables the other.
+    """
+
+    RENDER_POLL = 5
 
     def __init__(self, parent):
         super(PlotFrame, self).__init__(parent)
@@ -17,6 +214,23 @@ class PlotFrame(Frame, object):
         self._toolbar = None
         self._legend = None
         self._axes = None
+        self._series = OrderedDict()
+        self._data_limits = None
+        self._y_margin = 0.05
+        self._blit = False
+        self._background = None
+        self._render_lock = threading.RLock()
+        self._threaded = False
+        self._render_executor = None
+        self._render_future = None
+        self._render_pending = False
+        self._back_buffer = None
+        self._applying_limits = False
+        self._applied_xlim = None
+        self._pending_limits = None
+        self._deferred = []
+        self._render_thread = None
+        self._refresh_job = None
 
     def _setup_figure(self, size, dpi=100):
         if not isinstance(size, tuple) and not len(size) == 2:
@@ -27,18 +241,34 @@ class PlotFrame(Frame, object):
     def _setup_canvas(self):
         if not isinstance(self.figure, Figure):
             raise ValueError("Invalid figure object")
-        self._canvas = FigureCanvasTkAgg(self.figure, self)
+        self._canvas = PlotCanvas(self.figure, self)
+        self._guard_callbacks()
+        self.canvas.mpl_connect("draw_event", self._on_draw)
         self._setup_toolbar()
         self.canvas.show()
         self._canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True)
 
+    def _guard_callbacks(self):
+        """Skip the `draw_event` sent by renders in the worker thread, it is sent again from the main thread"""
+        callbacks = self.canvas.callbacks
+        process = callbacks.process
+
+        def guarded(signal, *args, **kwargs):
+            if signal == "draw_event" and threading.current_thread() is self._render_thread:
+                return None
+            return process(signal, *args, **kwargs)
+
+        callbacks.process = guarded
+
     def _setup_toolbar(self):
-        self._toolbar = NavigationToolbar2TkAgg(self.canvas, self)
+        self._toolbar = PlotToolbar(self.canvas, self)
         self.toolbar.update()
         self.canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
     def _setup_subplot(self):
         self._axes = self.figure.add_subplot(111)
+        self.axes.callbacks.connect("xlim_changed", self._on_xlim_changed)
+        self.axes.callbacks.connect("ylim_changed", self._on_limits_changed)
 
     @property
     def figure(self):
@@ -68,10 +298,47 @@ class PlotFrame(Frame, object):
     def legend(self):
         return self._legend
 
+    @property
+    def render_lock(self):
+        """Lock held while the figure is changed or rendered
+
+        :rtype: threading.RLock
+        """
+        return self._render_lock
+
     @property
     def toolbar(self):
         return self._toolbar
 
+    @property
+    def pixel_width(self):
+        """Width of the plotting area in pixels"""
+        result = 0
+        if self.axes is not None:
+            result = int(self.axes.bbox.width)
+        elif self.canvas is not None:
+            result = self.canvas.get_tk_widget().winfo_width()
+        return result
+
+    @property
+    def max_points(self):
+        """Maximum number of points worth drawing for a series: two per pixel column"""
+        return 2 * max(self.pixel_width, 1)
+
+    def query(self, index, x_min=None, x_max=None):
+        """Request the points to draw from a decimation index for the visible (or given) x-range
+
+        :param index: The index, providing `query(start, stop, max_points)`
+        :type index: julesTk.utils.decimate.MinMaxPyramid
+        :return: x and y values of at most `max_points` points
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        if x_min is None or x_max is None:
+            lower, upper = self.axes.get_xlim()
+            x_min = lower if x_min is None else x_min
+            x_max = upper if x_max is None else x_max
+        return index.query(int(math.floor(x_min)), int(math.ceil(x_max)) + 1, self.max_points)
+
     def setup(self, size=None, dpi=100):
         if size is None:
             size = (5, 5)
@@ -81,15 +348,379 @@ class PlotFrame(Frame, object):
 
     def add_legend(self):
         if self.axes is not None:
-            self._legend = self.axes.legend(loc='best')
+            with self.render_lock:
+                self._legend = self.axes.legend(loc='best')
 
-    def draw(self):
-        self.canvas.draw()
+    def _render(self):
+        if self.is_threaded():
+            self._render_in_thread()
+        elif self.is_blitting() and self._background is not None:
+            self._blit_lines()
+        else:
+            self.canvas.draw()
+
+    def destroy(self):
+        self._cancel_refresh()
+        self.set_threaded(False)
+        super(PlotFrame, self).destroy()
+
+    def is_threaded(self):
+        """Whether renders are performed on a worker thread"""
+        return self._threaded
+
+    def set_threaded(self, state):
+        """Enable or disable rendering on a worker thread, this disables blitting"""
+        self._threaded = state is True
+        if self._threaded:
+            if self.is_blitting():
+                self.set_blit(False)
+            if self._render_executor is None:
+                self._render_executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self._render_future = None
+            self._render_pending = False
+            self._back_buffer = None
+            if self._render_executor is not None:
+                # the figure may only change once a running render finished
+                self._render_executor.shutdown(wait=True)
+                self._render_executor = None
+            self._update_figure()
+
+    def is_rendering(self):
+        """Whether a render is in progress on the worker thread"""
+        return self._render_future is not None
+
+    def _render_size(self):
+        """Size of the canvas image in pixels"""
+        width, height = self.figure.bbox.size
+        return int(width), int(height)
+
+    def _render_in_thread(self):
+        if self.is_rendering():
+            self._render_pending = True
+            return
+        self._render_pending = False
+        self._update_figure()
+        width, height = self._render_size()
+        self._render_future = self._render_executor.submit(self._render_figure, width, height)
+        self.after(self.RENDER_POLL, self._check_render)
+
+    def _render_figure(self, width, height):
+        """Render the figure in the back buffer (runs on the worker thread)
+
+        :rtype: matplotlib.backends.backend_agg.RendererAgg
+        """
+        self._render_thread = threading.current_thread()
+        with self.render_lock:
+            renderer = self._back_buffer
+            if renderer is None or (renderer.width, renderer.height) != (width, height):
+                renderer = RendererAgg(width, height, self.figure.dpi)
+            else:
+                renderer.clear()
+            self.figure.draw(renderer)
+        self._back_buffer = renderer
+        return renderer
+
+    def _check_render(self):
+        """Show the render once finished, the previous frame is shown until then"""
+        future = self._render_future
+        if future is None:
+            return
+        if not future.done():
+            self.after(self.RENDER_POLL, self._check_render)
+            return
+        self._render_future = None
+        self._update_figure()
+        renderer = future.result()
+        if (renderer.width, renderer.height) == self._render_size():
+            _blit_photo(self.canvas._tkphoto, renderer)
+            self.canvas.callbacks.process("draw_event", DrawEvent("draw_event", self.canvas, renderer))
+        else:
+            # resized while rendering
+            self._render_pending = True
+        if self._render_pending:
+            self._render_in_thread()
+
+    def is_blitting(self):
+        """Whether only the lines are redrawn"""
+        return self._blit
+
+    def set_blit(self, state):
+        """Enable or disable blitting, only redrawing the lines on a cached background, this disables threaded
+        rendering"""
+        self._blit = state is True
+        if self._blit and self.is_threaded():
+            self.set_threaded(False)
+        with self.render_lock:
+            for series in self._series.values():
+                series.line.set_animated(self._blit)
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard the cached background, the next draw renders the full figure"""
+        self._background = None
+
+    def _on_limits_changed(self, axes):
+        self.invalidate()
+
+    def _on_xlim_changed(self, axes):
+        self.invalidate()
+        if not self._applying_limits:
+            self._schedule_refresh()
+
+    def _on_draw(self, event):
+        """Capture the background after a full render, and draw the (animated) lines on top of it"""
+        if self.is_blitting():
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self._draw_lines()
+
+    def _draw_lines(self):
+        for series in self._series.values():
+            self.axes.draw_artist(series.line)
+
+    def _blit_lines(self):
+        self.canvas.restore_region(self._background)
+        self._draw_lines()
+        self.canvas.blit(self.figure.bbox)
 
     def clear(self):
-        self.figure.clear()
-        self._setup_subplot()
-        self.canvas.draw()
+        with self.render_lock:
+            self.figure.clear()
+            self._series.clear()
+            self._data_limits = None
+            self._pending_limits = None
+            self._applied_xlim = None
+            self.invalidate()
+            self._setup_subplot()
+        self.draw_now()
+
+    @property
+    def y_margin(self):
+        """Space added above and below the data, as a fraction of the data range"""
+        return self._y_margin
+
+    @y_margin.setter
+    def y_margin(self, v):
+        self._y_margin = v
+
+    def has_line(self, name):
+        """Whether a line is registered under the given name"""
+        return name in self._series.keys()
+
+    def get_series(self, name):
+        """The series registered under the given name
+
+        :rtype: julesTk.view.plot.Series
+        """
+        if not self.has_line(name):
+            raise KeyError("No line registered under: {}".format(name))
+        return self._series[name]
+
+    def get_line(self, name):
+        """The artist of the line registered under the given name
+
+        :rtype: matplotlib.lines.Line2D
+        """
+        return self.get_series(name).line
+
+    def add_line(self, name, **kwargs):
+        """Add a new, empty, line to the axes
+
+        :param name: Name to register the line under, also used as label
+        :type name: str
+        :param kwargs: Properties of the line, passed to `axes.plot`
+        :rtype: matplotlib.lines.Line2D
+        """
+        if self.has_line(name):
+            raise KeyError("Already registered a line under: {}".format(name))
+        kwargs.setdefault("label", name)
+        kwargs.setdefault("animated", self.is_blitting())
+        with self.render_lock:
+            line, = self.axes.plot([], [], **kwargs)
+            self._series[name] = Series(name, line)
+        return line
+
+    def remove_line(self, name):
+        """Remove a line from the axes"""
+        series = self.get_series(name)
+        with self.render_lock:
+            series.line.remove()
+            self._series.pop(name)
+            self.invalidate()
+            self.rescale()
+
+    def set_data(self, name, x, y):
+        """Replace the points of a line
+
+        :return: Whether the axes limits were changed
+        :rtype: bool
+        """
+        self.get_series(name).set_data(x, y)
+        result = self.rescale()
+        self._update_figure()
+        return result
+
+    def append(self, name, x, y):
+        """Add points to a line
+
+        :return: Whether the axes limits were changed
+        :rtype: bool
+        """
+        result = False
+        x, y = self.get_series(name).append(x, y)
+        if len(x) > 0:
+            result = self._extend_limits(_limits(x, y))
+        self._update_figure()
+        return result
+
+    def set_source(self, name, source):
+        """Let a line show the points of a decimation index, queried for the visible x-range
+
+        :param name: Name of the line
+        :type name: str
+        :param source: The index, providing `query(start, stop, max_points)`, or None to detach the index
+        :type source: None | julesTk.utils.decimate.MinMaxPyramid
+        """
+        self.get_series(name).source = source
+        if source is not None:
+            self.refresh(name)
+
+    def get_source(self, name):
+        """The decimation index of a line
+
+        :rtype: None | julesTk.utils.decimate.MinMaxPyramid
+        """
+        return self.get_series(name).source
+
+    def is_zoomed(self):
+        """Whether the x-limits were changed by the user, instead of fitted to the data"""
+        return self._applied_xlim is not None and self.axes.get_xlim() != self._applied_xlim
+
+    def refresh(self, name=None):
+        """Query the sources of the lines again, for the visible x-range when zoomed and otherwise for all samples
+
+        :param name: Only refresh this line, defaults to all lines with a source
+        :type name: None | str
+        :return: Whether the axes limits were changed
+        :rtype: bool
+        """
+        self._cancel_refresh()
+        names = self._series.keys() if name is None else [name]
+        result = False
+        zoomed = self.is_zoomed()
+        for series in [self.get_series(n) for n in names]:
+            if series.source is None:
+                continue
+            if zoomed:
+                x, y = self.query(series.source)
+            else:
+                x, y = series.source.query(max_points=self.max_points)
+            series.set_data(x, y)
+        if not zoomed:
+            result = self.rescale()
+        self._update_figure()
+        return result
+
+    def _schedule_refresh(self):
+        """Refresh the lines with a source once the pending events are handled"""
+        if self._refresh_job is None and any(s.source is not None for s in self._series.values()):
+            self._refresh_job = self.after_idle(self._perform_refresh)
+
+    def _perform_refresh(self):
+        self._refresh_job = None
+        self.refresh()
+        self.draw()
+
+    def _cancel_refresh(self):
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+
+    def rescale(self):
+        """Fit the axes limits to the data of all lines
+
+        :return: Whether the axes limits were changed
+        :rtype: bool
+        """
+        limits = None
+        for series in self._series.values():
+            if len(series) > 0:
+                limits = _union(limits, _limits(series.x, series.y))
+        result = limits != self._data_limits
+        self._data_limits = limits
+        if result and limits is not None:
+            self._apply_limits(limits)
+        return result
+
+    def _extend_limits(self, limits):
+        """Grow the data limits, updating the axes limits when they change"""
+        limits = _union(self._data_limits, limits)
+        result = limits != self._data_limits
+        if result:
+            self._data_limits = limits
+            self._apply_limits(limits)
+        return result
+
+    def change_figure(self, f, *args):
+        """Call f to change the figure, postponed (in the main thread) while the figure is being rendered"""
+        self._deferred.append((f, args))
+        self._update_figure()
+
+    def _update_figure(self):
+        """Apply the postponed changes and show the changed data in the lines and axes limits, unless the figure
+        is being rendered"""
+        if self.is_rendering():
+            return
+        deferred, self._deferred = self._deferred, []
+        for f, args in deferred:
+            f(*args)
+        for series in self._series.values():
+            if series.is_stale():
+                series.update_line(copy=self.is_threaded())
+        if self._pending_limits is not None:
+            limits, self._pending_limits = self._pending_limits, None
+            self._set_limits(limits)
+
+    def _apply_limits(self, limits):
+        """Set the axes limits to fit the data limits, postponed while the figure is being rendered"""
+        self._pending_limits = limits
+        self._update_figure()
+
+    def _set_limits(self, limits):
+        x_min, x_max, y_min, y_max = limits
+        if x_min == x_max:
+            x_min, x_max = x_min - 0.5, x_max + 0.5
+        margin = (y_max - y_min) * self.y_margin
+        if margin == 0:
+            margin = 0.5
+        self._applying_limits = True
+        try:
+            self.axes.set_xlim(x_min, x_max, auto=False)
+            self.axes.set_ylim(y_min - margin, y_max + margin, auto=False)
+        finally:
+            self._applying_limits = False
+        self._applied_xlim = self.axes.get_xlim()
+
+
+def _limits(x, y):
+    """Bounding box (x_min, x_max, y_min, y_max) of points, ignoring points with nan (or infinite) values
+
+    :return: The bounding box, None when no point is finite (e.g. a gap in the data)
+    """
+    finite = numpy.isfinite(x) & numpy.isfinite(y)
+    if not finite.any():
+        return None
+    x, y = x[finite], y[finite]
+    return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+
+def _union(a, b):
+    """Bounding box containing both bounding boxes"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
 
 
 class PlotView(View):
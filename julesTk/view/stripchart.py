@@ -0,0 +1,358 @@
+"""Implement a light-weight streaming plot, drawn on a Tk Canvas"""
+
+from julesTk.view import *
+from julesTk.view.draw import DrawThrottle, as_points
+
+from collections import OrderedDict, deque
+
+__author__ = "Joeri Jongbloets <joeri@jongbloets.net>"
+
+
+class StripSeries(object):
+    """A named line in a StripChart, with its (most recent) points"""
+
+    def __init__(self, name, item, capacity=None):
+        super(StripSeries, self).__init__()
+        self._name = name
+        self._item = item
+        self._x = deque(maxlen=capacity)
+        self._y = deque(maxlen=capacity)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def item(self):
+        """Id of the canvas item drawing this series"""
+        return self._item
+
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    def __len__(self):
+        return len(self._x)
+
+    def set_data(self, x, y):
+        self._x.clear()
+        self._y.clear()
+        self.append(x, y)
+
+    def append(self, x, y):
+        x, y = _as_lists(x, y)
+        self._x.extend(x)
+        self._y.extend(y)
+
+    def trim(self, x_min):
+        """Remove the points before x_min"""
+        while len(self._x) > 0 and self._x[0] < x_min:
+            self._x.popleft()
+            self._y.popleft()
+
+
+def _as_lists(x, y):
+    return as_points(x, y, convert=lambda values: [float(v) for v in values])
+
+
+class StripChart(DrawThrottle, Frame):
+    """A frame plotting streaming data on a Tk Canvas, without matplotlib
+
+    Every line is a single canvas item, created once by `add_line`: drawing only updates the coordinates of the
+    items (and the texts of the tick labels), nothing is created or deleted per frame. Lines hold at most `capacity`
+    points and, when `window` is set, only the points within `window` of the last x-value: the chart scrolls. A
+    line never gets more than four points per pixel column (the first, minimum, maximum and last point).
+
+    The chart has the same line interface as `julesTk.view.plot.PlotFrame` (`add_line`, `append`, `set_data`,
+    `draw`), so controllers observing a model can draw on either of them. Like PlotFrame, `draw` coalesces requests
+    into at most `max_fps` renders per second.
+    """
+
+    COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f")
+    MARGIN_LEFT = 60
+    MARGIN_RIGHT = 10
+    MARGIN_TOP = 10
+    MARGIN_BOTTOM = 25
+    TICKS = 5
+
+    def __init__(self, parent, window=None, capacity=10000):
+        """Initialize the chart
+
+        :param window: Width of the shown x-range, None to show all points
+        :type window: None | float
+        :param capacity: Maximum number of points kept per line
+        :type capacity: None | int
+        """
+        super(StripChart, self).__init__(parent)
+        self._canvas = None
+        self._series = OrderedDict()
+        self._window = window
+        self._capacity = capacity
+        self._ylim = None
+        self._y_margin = 0.05
+        self._frame_item = None
+        self._x_ticks = []
+        self._y_ticks = []
+
+    def setup(self, size=None, background="white"):
+        """Create the canvas
+
+        :param size: Initial width and height in pixels
+        :type size: None | tuple[int, int]
+        """
+        if size is None:
+            size = (500, 500)
+        width, height = size
+        self._canvas = tk.Canvas(self, width=width, height=height, background=background, highlightthickness=0)
+        self._frame_item = self.canvas.create_rectangle(0, 0, 0, 0, outline="black")
+        self._x_ticks = [self.canvas.create_text(0, 0, anchor=tk.N, font=self.FONT_SMALL) for _ in range(self.TICKS)]
+        self._y_ticks = [self.canvas.create_text(0, 0, anchor=tk.E, font=self.FONT_SMALL) for _ in range(self.TICKS)]
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+    @property
+    def canvas(self):
+        """The canvas the chart is drawn on
+
+        :rtype: Tkinter.Canvas | tkinter.Canvas
+        """
+        return self._canvas
+
+    @property
+    def window(self):
+        """Width of the shown x-range, None to show all points"""
+        return self._window
+
+    @window.setter
+    def window(self, v):
+        if v is not None and v <= 0:
+            raise ValueError("Invalid window: {}".format(v))
+        self._window = v
+
+    @property
+    def capacity(self):
+        """Maximum number of points kept per line"""
+        return self._capacity
+
+    @property
+    def y_margin(self):
+        """Space added above and below the data, as a fraction of the data range"""
+        return self._y_margin
+
+    @y_margin.setter
+    def y_margin(self, v):
+        self._y_margin = v
+
+    def set_ylim(self, lower=None, upper=None):
+        """Fix the y-range of the chart, call without arguments to fit the y-range to the data"""
+        self._ylim = None if lower is None or upper is None else (float(lower), float(upper))
+
+    def get_ylim(self):
+        """The fixed y-range, None if fitted to the data"""
+        return self._ylim
+
+    @property
+    def pixel_width(self):
+        """Width of the plotting area in pixels"""
+        result = 0
+        if self.canvas is not None:
+            result = self.canvas.winfo_width() - self.MARGIN_LEFT - self.MARGIN_RIGHT
+        return max(result, 1)
+
+    @property
+    def pixel_height(self):
+        """Height of the plotting area in pixels"""
+        result = 0
+        if self.canvas is not None:
+            result = self.canvas.winfo_height() - self.MARGIN_TOP - self.MARGIN_BOTTOM
+        return max(result, 1)
+
+    def has_line(self, name):
+        """Whether a line is registered under the given name"""
+        return name in self._series.keys()
+
+    def get_series(self, name):
+        """The series registered under the given name
+
+        :rtype: julesTk.view.stripchart.StripSeries
+        """
+        if not self.has_line(name):
+            raise KeyError("No line registered under: {}".format(name))
+        return self._series[name]
+
+    def add_line(self, name, color=None, width=1):
+        """Add a new, empty, line to the chart
+
+        :param name: Name to register the line under
+        :type name: str
+        :param color: Color of the line, defaults to the next color of COLORS
+        :type color: None | str
+        :return: Id of the canvas item
+        :rtype: int
+        """
+        if self.has_line(name):
+            raise KeyError("Already registered a line under: {}".format(name))
+        if color is None:
+            color = self.COLORS[len(self._series) % len(self.COLORS)]
+        item = self.canvas.create_line(0, 0, 0, 0, fill=color, width=width, state=tk.HIDDEN)
+        self._series[name] = StripSeries(name, item, capacity=self.capacity)
+        return item
+
+    def remove_line(self, name):
+        """Remove a line from the chart"""
+        series = self.get_series(name)
+        self.canvas.delete(series.item)
+        self._series.pop(name)
+
+    def set_data(self, name, x, y):
+        """Replace the points of a line"""
+        self.get_series(name).set_data(x, y)
+
+    def append(self, name, x, y):
+        """Add points to a line"""
+        self.get_series(name).append(x, y)
+
+    def clear(self):
+        """Remove all lines"""
+        for name in list(self._series.keys()):
+            self.remove_line(name)
+        self.draw_now()
+
+    def x_limits(self):
+        """The shown x-range, None without points"""
+        x_max = None
+        x_min = None
+        for series in self._series.values():
+            if len(series) > 0:
+                x_max = series.x[-1] if x_max is None else max(x_max, series.x[-1])
+                x_min = series.x[0] if x_min is None else min(x_min, series.x[0])
+        if x_max is None:
+            return None
+        if self.window is not None:
+            x_min = x_max - self.window
+        return x_min, x_max
+
+    def y_limits(self, x_min):
+        """The shown y-range, None without points"""
+        if self._ylim is not None:
+            return self._ylim
+        y_min = y_max = None
+        for series in self._series.values():
+            values = [y for x, y in zip(series.x, series.y) if x >= x_min]
+            if len(values) > 0:
+                y_min = min(values) if y_min is None else min(y_min, min(values))
+                y_max = max(values) if y_max is None else max(y_max, max(values))
+        if y_min is None:
+            return None
+        margin = (y_max - y_min) * self.y_margin
+        if margin == 0:
+            margin = 0.5
+        return y_min - margin, y_max + margin
+
+    def _on_resize(self, event):
+        self.draw()
+
+    def _render(self):
+        left, top = self.MARGIN_LEFT, self.MARGIN_TOP
+        width, height = self.pixel_width, self.pixel_height
+        self.canvas.coords(self._frame_item, left, top, left + width, top + height)
+        x_limits = self.x_limits()
+        y_limits = None if x_limits is None else self.y_limits(x_limits[0])
+        if y_limits is None:
+            for series in self._series.values():
+                self.canvas.itemconfigure(series.item, state=tk.HIDDEN)
+            self._draw_ticks(None, None)
+            return
+        x_min, x_max = x_limits
+        if x_min == x_max:
+            x_min, x_max = x_min - 0.5, x_max + 0.5
+        y_min, y_max = y_limits
+        x_scale = width / (x_max - x_min)
+        y_scale = height / (y_max - y_min)
+        for series in self._series.values():
+            if self.window is not None:
+                series.trim(x_min)
+            coords = self._line_coords(series, x_min, x_scale, y_max, y_scale)
+            if len(coords) < 4:
+                self.canvas.itemconfigure(series.item, state=tk.HIDDEN)
+            else:
+                self.canvas.coords(series.item, *coords)
+                self.canvas.itemconfigure(series.item, state=tk.NORMAL)
+        self._draw_ticks((x_min, x_max), (y_min, y_max))
+
+    def _line_coords(self, series, x_min, x_scale, y_max, y_scale):
+        """Canvas coordinates of a line, keeping the first, minimum, maximum and last point of each pixel column"""
+        left, top = self.MARGIN_LEFT, self.MARGIN_TOP
+        result = []
+        column = None
+        points = []
+        for x, y in zip(series.x, series.y):
+            px = int(left + (x - x_min) * x_scale)
+            py = top + (y_max - y) * y_scale
+            if px != column:
+                result.extend(_column_points(points))
+                column = px
+                points = []
+            points.append((px, py))
+        result.extend(_column_points(points))
+        return result
+
+    def _draw_ticks(self, x_limits, y_limits):
+        """Place the tick labels along the axes, hiding them without data"""
+        left, top = self.MARGIN_LEFT, self.MARGIN_TOP
+        width, height = self.pixel_width, self.pixel_height
+        for index in range(self.TICKS):
+            fraction = index / float(self.TICKS - 1)
+            x_item, y_item = self._x_ticks[index], self._y_ticks[index]
+            if x_limits is None:
+                self.canvas.itemconfigure(x_item, text="")
+                self.canvas.itemconfigure(y_item, text="")
+                continue
+            x_value = x_limits[0] + fraction * (x_limits[1] - x_limits[0])
+            y_value = y_limits[0] + fraction * (y_limits[1] - y_limits[0])
+            self.canvas.coords(x_item, left + fraction * width, top + height + 4)
+            self.canvas.itemconfigure(x_item, text="{:.4g}".format(x_value))
+            self.canvas.coords(y_item, left - 4, top + (1 - fraction) * height)
+            self.canvas.itemconfigure(y_item, text="{:.4g}".format(y_value))
+
+
+def _column_points(points):
+    """Reduce the points in one pixel column to the first, minimum, maximum and last point (flattened)"""
+    if len(points) <= 4:
+        selected = points
+    else:
+        lowest = max(points, key=lambda p: p[1])
+        highest = min(points, key=lambda p: p[1])
+        selected = [points[0], lowest, highest, points[-1]]
+    result = []
+    for px, py in selected:
+        result.extend((px, py))
+    return result
+
+
+class StripChartView(View):
+    """A view with a strip chart embedded"""
+
+    def __init__(self, parent, controller):
+        super(StripChartView, self).__init__(parent, controller)
+        self._plot = None
+
+    @property
+    def plot(self):
+        """Returns the strip chart embedded in this view
+
+        :rtype: julesTk.view.stripchart.StripChart
+        """
+        return self._plot
+
+    def body(self):
+        self.configure_grid(self)
+        self.setup_plot()
+
+    def setup_plot(self):
+        self._plot = StripChart(self)
+        self.plot.setup()
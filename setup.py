@@ -78,6 +78,7 @@ setup(
     install_requires=[
         #'TkInter',
         #'ttk',
+        'futures; python_version < "3"',
     ],
 
     # List additional groups of dependencies here (e.g. development
@@ -85,7 +86,8 @@ setup(
     # for example:
     # $ pip install -e .[dev,test]
     extras_require={
-        "plot": ['matplotlib']
+        "plot": ['matplotlib'],
+        "timeseries": ['numpy'],
         #'dev': ['check-manifest'],
         #'test': ['coverage'],
     },